@@ -0,0 +1,26 @@
+import plotly.express as px
+from active_timeseries import ActiveTimeSeries
+
+# Change measure: 'active' (amount of running ads), 'spend' or 'impressions' (averages, spread over the days an ad ran)
+measure = 'active'
+# Only count the ads with this keyword, '' for all ads
+keyword = ''
+# 'substring' or 'word', see keyword-plotter.py
+matchMode = 'substring'
+ignoreCase = False
+
+# Sum the running ads per day for both parties
+timeSeries = ActiveTimeSeries([keyword] if keyword != '' else [], matchMode, ignoreCase,
+                              parties=['democrats', 'republicans'])
+mergedCounts = timeSeries.partyFrame(measure, keyword if keyword != '' else None)
+
+titles = {'active': 'Running ads', 'spend': 'Spend of running ads', 'impressions': 'Impressions of running ads'}
+title = titles[measure] + ' per day'
+if keyword != '':
+    title += " with keyword '" + keyword + "'"
+
+# Below code generates an interactive line graph
+print(mergedCounts.head(10))
+fig = px.line(mergedCounts, x='date', y=['Democrats', 'Republicans'], title=title)
+fig.update_layout(yaxis_title=titles[measure], xaxis_title="Date", legend_title="Party", font_size=30)
+fig.show()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from ad_store import loadAds, midColumn, PARTY_DIRS, STORE_DIR
+from keyword_matcher import matchPartyAds, unpackMatches
+from keyword_timeseries import dayIndex, CHUNK_SIZE
+
+# Daily measures: the amount of ads that ran on the day, and the part of their spend and impressions (the averages)
+# that falls on the day, with every ad spread evenly over the days it ran
+MEASURES = ['active', 'spend', 'impressions']
+
+
+# Adds intervals of days [starts, stops] with a weight per interval to a difference array diff[day, series]: the weight
+# is added at the start day and taken off after the stop day, so the cumulative sum over the days gives the sum of the
+# weights of the intervals that contain each day
+def addIntervals(diff, starts, stops, weights, series):
+    seriesCount = diff.shape[1]
+    diff += np.bincount(starts * seriesCount + series, weights, minlength=diff.size).reshape(diff.shape)
+    diff -= np.bincount((stops + 1) * seriesCount + series, weights, minlength=diff.size).reshape(diff.shape)
+
+
+class ActiveTimeSeries:
+    """
+    Daily sums of the ads that were running, from ad_delivery_start_time up to and including ad_delivery_stop_time, in
+    values[measure][day, series, party]. Series 0 holds all ads, series i + 1 the ads that match keyword i. Ads without
+    a stop time are still running on the last day of the data. Every ad is added once to a difference array, so the
+    time is linear in the amount of ads and days instead of in the amount of days that all ads ran.
+    """
+    def __init__(self, keywords=(), matchMode='substring', ignoreCase=False, parties=None, storeDir=STORE_DIR):
+        self.keywords = list(keywords)
+        self.parties = list(PARTY_DIRS) if parties is None else list(parties)
+
+        ads = {}
+        for party in self.parties:
+            ads[party] = loadAds(party, ['ad_delivery_start_time', 'ad_delivery_stop_time', midColumn('spend'),
+                                         midColumn('impressions')], storeDir)
+
+        starts = pd.concat([df['ad_delivery_start_time'] for df in ads.values()])
+        stops = pd.concat([df['ad_delivery_stop_time'] for df in ads.values()])
+        if starts.notna().any():
+            origin = starts.min().normalize()
+            dayCount = int((max(starts.max(), stops.max() if stops.notna().any() else starts.max()) - origin).days) + 1
+        else:
+            origin = pd.Timestamp(0)
+            dayCount = 0
+        self.dates = pd.date_range(origin, periods=dayCount, freq='1D')
+
+        seriesCount = len(self.keywords) + 1
+        self.values = {measure: np.zeros((dayCount, seriesCount, len(self.parties))) for measure in MEASURES}
+        for p, party in enumerate(self.parties):
+            df = ads[party]
+            startDays = dayIndex(df['ad_delivery_start_time'], origin)
+            stopDays = dayIndex(df['ad_delivery_stop_time'], origin)
+            stopDays = np.where(df['ad_delivery_stop_time'].isna().to_numpy(), dayCount - 1,
+                                np.maximum(stopDays, startDays))
+            days = stopDays - startDays + 1
+            weights = {
+                'active': np.ones(len(df)),
+                'spend': np.nan_to_num(df[midColumn('spend')].to_numpy() / days),
+                'impressions': np.nan_to_num(df[midColumn('impressions')].to_numpy() / days),
+            }
+            # Ads without a start time did not run on a known day
+            running = np.flatnonzero(startDays >= 0)
+
+            # One extra day for the stops on the last day
+            diffs = {measure: np.zeros((dayCount + 1, seriesCount)) for measure in MEASURES}
+            for measure in MEASURES:
+                addIntervals(diffs[measure], startDays[running], stopDays[running], weights[measure][running],
+                             np.zeros(len(running), dtype=np.int64))
+
+            if len(self.keywords) > 0:
+                bitsets = matchPartyAds(party, self.keywords, matchMode, ignoreCase, storeDir)
+                for start in range(0, len(df), CHUNK_SIZE):
+                    rows, keywords = np.nonzero(unpackMatches(bitsets[start:start + CHUNK_SIZE], len(self.keywords)))
+                    rows += start
+                    matched = startDays[rows] >= 0
+                    rows = rows[matched]
+                    for measure in MEASURES:
+                        addIntervals(diffs[measure], startDays[rows], stopDays[rows], weights[measure][rows],
+                                     keywords[matched] + 1)
+
+            for measure in MEASURES:
+                self.values[measure][:, :, p] = np.cumsum(diffs[measure], axis=0)[:dayCount]
+
+    def partyFrame(self, measure='active', keyword=None):
+        """
+        Returns dataframe with a row per day and a column per party (capitalized), for all ads or those of a keyword.
+        """
+        series = 0 if keyword is None else self.keywords.index(keyword) + 1
+        df = pd.DataFrame(self.values[measure][:, series, :], columns=[party.capitalize() for party in self.parties])
+        df.insert(0, 'date', self.dates)
+        return df
+
+    def keywordFrame(self, measure='active'):
+        """
+        Returns dataframe with a row per day and a column per keyword, with all parties summed.
+        """
+        df = pd.DataFrame(self.values[measure][:, 1:, :].sum(axis=2), columns=self.keywords)
+        df.insert(0, 'date', self.dates)
+        return df
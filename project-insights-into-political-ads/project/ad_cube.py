@@ -0,0 +1,222 @@
+import numpy as np
+import pandas as pd
+from os import makedirs
+from os.path import isfile, join
+from ad_store import iterPage, loadPage, checkStore, concatFrames, derivedDir, mapFiles, midColumn, pageFiles, \
+    partialDir, partialFile, removeStalePartials, PARTY_DIRS, RANGE_COLUMNS, STORE_DIR
+from distributions import explodePages, DISTRIBUTION_KEYS
+
+# Dimensions of every cube, next to `party` and the keys of the distribution of the cube. `day` is the day of
+# ad_delivery_start_time
+DIMENSIONS = ['page_id', 'day', 'currency', 'publisher_platforms', 'languages']
+# Distribution column of every cube. The 'ads' cube counts every ad once and also has whether an ad has distribution
+# entries as dimensions, the other cubes weigh every ad by the percentages of its distribution entries. A cube over
+# both distributions would only multiply the entries, the distributions are given per ad and not jointly. The 'ranges'
+# cube is not keyed by DIMENSIONS, see `buildRangesCube`
+CUBES = {
+    'ads': None,
+    'demographic': 'demographic_distribution',
+    'region': 'delivery_by_region',
+    'ranges': None,
+}
+# Dimensions of the 'ranges' cube, next to `party` and whether an ad has distribution entries
+RANGE_DIMENSIONS = ['column', 'range']
+
+
+# Version of the layout of the cubes, the cubes and partials of another version are built again
+CUBE_VERSION = 4
+
+
+# Name of the dimension of the 'ads' and 'ranges' cubes that tells if an ad has entries in a distribution column
+def hasColumn(column):
+    return 'has_' + column
+
+
+# Name of the measure with the (weighted) amount of ads that have a value for a range column
+def adsColumn(column):
+    return column + '_ads'
+
+
+# Returns the measures of every cube: `ads`, and the weighted sum of the average and the weighted amount of ads
+# with a value for every range column
+def measures():
+    return ['ads'] + [column for metric in RANGE_COLUMNS for column in [metric, adsColumn(metric)]]
+
+
+# Returns whether every ad has entries in the distribution columns, as the dimensions of the 'ads' and 'ranges' cubes
+def distributionFlags(ads, distributions):
+    flags = {}
+    for column, entries in distributions.items():
+        has = np.zeros(len(ads), dtype=bool)
+        has[entries['row'].to_numpy()] = True
+        flags[hasColumn(column)] = has
+    return flags
+
+
+# Aggregates a dataframe of ads into a cube: one row per combination of dimension values that occurs, with the sums
+# of the measures. `distributions` has the long format of the distribution columns of the ads
+def buildCube(ads, name, distributions):
+    df = pd.DataFrame({
+        'page_id': ads['page_id'].to_numpy(),
+        'day': ads['ad_delivery_start_time'].dt.normalize().to_numpy(),
+        'currency': ads['currency'].array,
+        'publisher_platforms': ads['publisher_platforms'].array,
+        'languages': ads['languages'].array,
+    })
+    dimensions = list(DIMENSIONS)
+
+    column = CUBES[name]
+    if column is None:
+        rows = np.arange(len(ads))
+        weights = np.ones(len(ads))
+        for flag, has in distributionFlags(ads, distributions).items():
+            df[flag] = has
+            dimensions.append(flag)
+    else:
+        entries = distributions[column]
+        rows = entries['row'].to_numpy()
+        weights = entries['percentage'].to_numpy()
+        df = df.iloc[rows].reset_index(drop=True)
+        for key in DISTRIBUTION_KEYS[column]:
+            df[key] = entries[key].array
+            dimensions.append(key)
+
+    df['ads'] = weights
+    for metric in RANGE_COLUMNS:
+        mids = ads[midColumn(metric)].to_numpy()[rows]
+        df[metric] = mids * weights
+        df[adsColumn(metric)] = np.where(np.isnan(mids), 0, weights)
+
+    return df.groupby(dimensions, as_index=False, observed=True, dropna=False, sort=False)[measures()].sum()
+
+
+# Aggregates a dataframe of ads into the 'ranges' cube: the amount of ads per range string (like 'lower_bound: 0,
+# upper_bound: 99') of every range column, and per whether the ads have entries in the distribution columns. Ads
+# without a value for a range column are not counted for it
+def buildRangesCube(ads, distributions):
+    flags = distributionFlags(ads, distributions)
+
+    dfs = []
+    for metric in RANGE_COLUMNS:
+        rows = np.flatnonzero(ads[metric].notna().to_numpy())
+        df = pd.DataFrame({'column': metric, 'range': ads[metric].to_numpy(dtype=object)[rows]})
+        for flag, has in flags.items():
+            df[flag] = has[rows]
+        dfs.append(df)
+    df = pd.concat(dfs, ignore_index=True)
+    df['column'] = pd.Categorical(df['column'], categories=RANGE_COLUMNS)
+    df['range'] = df['range'].astype('category')
+    df['ads'] = np.ones(len(df))
+    return df.groupby(RANGE_DIMENSIONS + list(flags), as_index=False, observed=True, sort=False)[['ads']].sum()
+
+
+# Returns the entries of a long format of the ads of a page from position `start` to `stop`, with `row` relative to
+# `start`. The entries are sorted by `row`
+def entriesBetween(entries, start, stop):
+    bounds = np.searchsorted(entries['row'].to_numpy(), [start, stop])
+    df = entries.iloc[bounds[0]:bounds[1]].reset_index(drop=True)
+    df['row'] -= start
+    return df
+
+
+# Aggregates a chunk of the ads of a page, from position `start`, into the cubes `names`
+def buildChunkCubes(ads, start, distributions, names):
+    chunkDistributions = {column: entriesBetween(entries, start, start + len(ads))
+                          for column, entries in distributions.items()}
+    return {name: buildRangesCube(ads, chunkDistributions) if name == 'ranges' else
+            buildCube(ads, name, chunkDistributions) for name in names}
+
+
+# Aggregates one page file into all cubes in one pass over its ads, a chunk of ads at a time. The distribution
+# columns are not parsed again, their long format is read from the partials of `explodePages`
+def buildPageCubes(file, distributionPartials, partials):
+    distributions = {column: pd.read_parquet(partial) for column, partial in distributionPartials.items()}
+    columns = ['page_id', 'ad_delivery_start_time', 'currency', 'publisher_platforms', 'languages'] + \
+        [midColumn(metric) for metric in RANGE_COLUMNS] + RANGE_COLUMNS
+    chunks = []
+    offset = 0
+    for ads in iterPage(file, columns):
+        chunks.append(buildChunkCubes(ads, offset, distributions, partials))
+        offset += len(ads)
+    # A page without ads still gets its (empty) cubes
+    if offset == 0:
+        chunks.append(buildChunkCubes(loadPage(file, columns), 0, distributions, partials))
+    for name, partial in partials.items():
+        combineCubes([cubes[name] for cubes in chunks]).to_parquet(partial, index=False)
+
+
+# Combines cubes into one with a row per combination of dimension values, summing the measures
+def combineCubes(cubes):
+    if len(cubes) == 1:
+        return cubes[0]
+    df = concatFrames(cubes)
+    dimensions = [column for column in df.columns if column not in measures()]
+    cubeMeasures = [column for column in measures() if column in df.columns]
+    return df.groupby(dimensions, as_index=False, observed=True, dropna=False, sort=False)[cubeMeasures].sum()
+
+
+def cubeFile(party, name, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), cubeKind(name) + '.parquet')
+
+
+def cubeKind(name):
+    return 'cube-' + name + '-' + str(CUBE_VERSION)
+
+
+# Returns a cube of a party. The cubes of every page are kept in the store, only new or changed pages are aggregated
+# again, into all cubes at once. The cube of the party holds the rows of the cubes of all pages, it is combined once
+# and then read from the store until a page changes. The scripts have no `__main__` guard, so by default the pages are
+# aggregated in this process
+def loadPartyCube(party, name, storeDir=STORE_DIR, workers=1):
+    checkStore(party, storeDir)
+    file = cubeFile(party, name, storeDir)
+    if isfile(file):
+        return pd.read_parquet(file)
+
+    kind = cubeKind(name)
+    files = pageFiles(party, storeDir)
+    hashes = explodePages(party, storeDir, workers)
+    for other in CUBES:
+        makedirs(partialDir(party, cubeKind(other), storeDir), exist_ok=True)
+    missing = {pageHash: page for page, pageHash in zip(files, hashes)
+               if not isfile(partialFile(party, kind, pageHash, storeDir))}
+    mapFiles(buildPageCubes, list(missing.values()),
+             [{column: partialFile(party, column, pageHash, storeDir) for column in DISTRIBUTION_KEYS}
+              for pageHash in missing],
+             [{other: partialFile(party, cubeKind(other), pageHash, storeDir) for other in CUBES}
+              for pageHash in missing], workers=workers)
+
+    partials = [pd.read_parquet(partialFile(party, kind, pageHash, storeDir)) for pageHash in hashes]
+    # The rows of the other cubes are per page, the pages share the rows of the 'ranges' cube
+    df = combineCubes(partials) if name == 'ranges' and len(partials) > 0 else concatFrames(partials)
+    df = df.reset_index(drop=True)
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    df.to_parquet(file, index=False)
+    removeStalePartials(party, kind, hashes, storeDir)
+    return df
+
+
+# Returns a cube of the parties (all by default) in one dataframe, with the party as first dimension
+def loadCube(name, parties=None, storeDir=STORE_DIR, workers=1):
+    if parties is None:
+        parties = list(PARTY_DIRS)
+    dfs = []
+    for party in parties:
+        df = loadPartyCube(party, name, storeDir, workers)
+        df.insert(0, 'party', pd.Categorical([party] * len(df), categories=parties))
+        dfs.append(df)
+    return concatFrames(dfs).reset_index(drop=True)
+
+
+# Sums the measures of a cube over all dimensions that are not in `by`
+def rollUp(cube, by, columns=None):
+    if columns is None:
+        columns = [column for column in measures() if column in cube.columns]
+    return cube.groupby(by, as_index=False, observed=True)[columns].sum()
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        for name in CUBES:
+            print('Building the ' + name + ' cube of ' + party)
+            loadPartyCube(party, name, workers=None)
@@ -0,0 +1,416 @@
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from os import cpu_count, environ, listdir, makedirs, remove, replace, stat
+from os.path import basename, isfile, isdir, join, splitext
+from pandas.api.types import union_categoricals
+
+# All columns available in the ad csv files. `ad_archive_id` is always loaded
+ALL_COLUMNS = ['ad_archive_id', 'page_id', 'page_name', 'ad_creation_time', 'ad_delivery_start_time',
+               'ad_delivery_stop_time', 'byline', 'ad_creative_bodies', 'ad_creative_link_titles',
+               'ad_creative_link_captions', 'ad_creative_link_descriptions', 'impressions', 'spend', 'currency',
+               'demographic_distribution', 'delivery_by_region', 'publisher_platforms', 'estimated_audience_size',
+               'languages']
+TEXT_COLUMNS = ['ad_creative_bodies', 'ad_creative_link_titles', 'ad_creative_link_captions',
+                'ad_creative_link_descriptions']
+
+# Declared types of the csv columns, columns that are not listed are read as text. The creative texts repeat over many
+# ads, as categories every distinct text is held once with an integer code per ad, in memory and in the page files
+SCHEMA = {
+    'ad_archive_id': 'int64',
+    'page_id': 'int64',
+    'currency': 'category',
+    'publisher_platforms': 'category',
+    'languages': 'category',
+    **{column: 'category' for column in TEXT_COLUMNS},
+}
+DATE_COLUMNS = ['ad_creation_time', 'ad_delivery_start_time', 'ad_delivery_stop_time']
+# Columns with 'lower_bound: x, upper_bound: y' values. The store also holds their bounds and average as numbers
+RANGE_COLUMNS = ['impressions', 'spend', 'estimated_audience_size']
+
+PARTY_DIRS = {'democrats': './ads/democrats', 'republicans': './ads/republicans'}
+STORE_DIR = './store'
+# Version of the layout of the page files (3: creative texts as dictionary columns). The first script that reads a
+# store with another version ingests it again from scratch, see `checkStore`
+STORE_VERSION = 3
+# The ads of every page file are sorted by this column, ads without it come last
+SORT_COLUMN = 'ad_delivery_start_time'
+# Upper bound of processes used to parse the page csv files
+MAX_WORKERS = cpu_count() or 1
+# Amount of ads that the streaming functions (`iterPage`, `iterAds`) read at once, which bounds the memory of building
+# the derived data. Set AD_STORE_CHUNK_ROWS to lower it on machines with little memory
+CHUNK_ROWS = int(environ.get('AD_STORE_CHUNK_ROWS', 100000))
+
+
+# Returns the page csv files of a directory, in a fixed order
+def listCsvs(directory):
+    return sorted([f for f in listdir(directory) if isfile(join(directory, f)) and f.endswith('.csv')])
+
+
+# Returns dataframe of a page csv. Only the requested columns are parsed, with the types of `SCHEMA`
+def loadCsv(csv, columns=None):
+    if columns is None:
+        columns = ALL_COLUMNS
+    else:
+        columns = ['ad_archive_id'] + [column for column in columns if column != 'ad_archive_id']
+
+    dateColumns = [column for column in columns if column in DATE_COLUMNS]
+    dtypes = {column: SCHEMA.get(column, 'object') for column in columns if column not in dateColumns}
+    df = pd.read_csv(csv, usecols=columns, dtype=dtypes, parse_dates=dateColumns)
+    return df[columns]
+
+
+# Calls function for every file like map(), spread over a bounded pool of processes. With one worker it runs in
+# this process
+def mapFiles(function, files, *iterables, workers=None):
+    if workers is None:
+        workers = MAX_WORKERS
+    workers = max(1, min(workers, len(files)))
+    if workers == 1:
+        return list(map(function, files, *iterables))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, files, *iterables))
+
+
+# Concatenates dataframes. Categorical columns get the union of all categories, so they are not upcast to text
+def concatFrames(dfs):
+    if len(dfs) == 0:
+        return pd.DataFrame()
+
+    for column in dfs[0].columns:
+        if not all(isinstance(df[column].dtype, pd.CategoricalDtype) for df in dfs):
+            continue
+        categories = union_categoricals([df[column] for df in dfs], ignore_order=True).categories
+        for df in dfs:
+            df[column] = df[column].cat.set_categories(categories)
+
+    return pd.concat(dfs)
+
+
+# Returns the distinct combinations of the values of columns (a missing value counts as a value): the first row of every
+# combination, the combination of every row (numbered in the order they first occur) and the amount of rows of every
+# combination. Work on the texts of ads can then be done once per distinct creative and weighed by the counts
+def uniqueRows(df, columns):
+    key = np.zeros(len(df), dtype=np.int64)
+    for column in columns:
+        codes, uniques = pd.factorize(df[column])
+        key = pd.factorize(key * (len(uniques) + 1) + codes + 1)[0]
+    first = np.unique(key, return_index=True)[1]
+    return df.iloc[first], key, np.bincount(key, minlength=len(first))
+
+
+# Expands items of distinct combinations (see `uniqueRows`) to the rows with those combinations: returns, for every row
+# of the combination of every item, the position of the item and the row
+def expandUnique(key, counts, combinations):
+    rows = np.argsort(key, kind='stable')
+    starts = np.cumsum(counts) - counts
+    lengths = counts[combinations]
+    offsets = np.repeat(starts[combinations] - np.cumsum(lengths) + lengths, lengths)
+    return np.repeat(np.arange(len(combinations)), lengths), rows[offsets + np.arange(lengths.sum())]
+
+
+# Returns dataframe of all page csv files in a directory, parsed concurrently
+def loadCsvsFromDir(directory, columns=None, workers=None):
+    files = [join(directory, file) for file in listCsvs(directory)]
+    return concatFrames(mapFiles(loadCsv, files, repeat(columns), workers=workers))
+
+
+# Names of the store columns with the parsed bounds and the average of both bounds of a range column
+def lowerColumn(column):
+    return column + '_lower'
+
+
+def upperColumn(column):
+    return column + '_upper'
+
+
+def midColumn(column):
+    return column + '_mid'
+
+
+# Returns dataframe with the lower bound, upper bound and average of a range column as floats. Ranges without an
+# upper bound use the lower bound as upper bound. Every distinct range string is only parsed once
+def parseRanges(series):
+    codes, ranges = pd.factorize(series.astype('object'))
+    bounds = pd.Series(ranges, dtype='object').str.replace(',', '', regex=False).str.extract(
+        r'^\S+\s+(\d+)(?:\s+\S+\s+(\d+))?')
+    lower = bounds[0].astype('float64').to_numpy()
+    upper = bounds[1].astype('float64').fillna(bounds[0].astype('float64')).to_numpy()
+
+    # Missing values have code -1, they take the extra NaN at the end
+    lower = np.append(lower, np.nan)[codes]
+    upper = np.append(upper, np.nan)[codes]
+    return pd.DataFrame({
+        lowerColumn(series.name): lower,
+        upperColumn(series.name): upper,
+        midColumn(series.name): (lower + upper) / 2
+    }, index=series.index)
+
+
+def partyStoreDir(party, storeDir=STORE_DIR):
+    return join(storeDir, 'ads', party)
+
+
+# Directory for data derived from the ads of a party. It is removed when the party is ingested again
+def derivedDir(party, storeDir=STORE_DIR):
+    return join(storeDir, 'derived', party)
+
+
+# Converts a page csv into a parquet file with the ads sorted by SORT_COLUMN. Returns the amount of ads and the first
+# and last date of the page
+def ingestCsv(csv, parquetFile):
+    df = loadCsv(csv)
+    df = pd.concat([df] + [parseRanges(df[column]) for column in RANGE_COLUMNS], axis=1)
+    df = df.sort_values(SORT_COLUMN, kind='stable', na_position='last').reset_index(drop=True)
+    df.to_parquet(parquetFile, index=False)
+    dates = df[SORT_COLUMN].dropna()
+    return {
+        'rows': len(df),
+        'first': dates.iloc[0].isoformat() if len(dates) > 0 else None,
+        'last': dates.iloc[-1].isoformat() if len(dates) > 0 else None,
+    }
+
+
+# Manifest of the page csv files in the store of a party: size, modification time, content hash, amount of ads and
+# first and last date by csv file name
+def manifestFile(party, storeDir=STORE_DIR):
+    return join(storeDir, 'ads', party + '-manifest.json')
+
+
+# Returns the manifest of a party, empty when the store has no manifest or one of another STORE_VERSION
+def readManifest(party, storeDir=STORE_DIR):
+    file = manifestFile(party, storeDir)
+    if not isfile(file) or not isdir(partyStoreDir(party, storeDir)):
+        return {}
+    with open(file, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest['pages'] if manifest.get('version') == STORE_VERSION else {}
+
+
+# Returns whether the store of a party can be read: it has a manifest of this STORE_VERSION and a page file for
+# every csv file of the manifest, and no others
+def isIngested(party, storeDir=STORE_DIR):
+    partyDir = partyStoreDir(party, storeDir)
+    if not isfile(manifestFile(party, storeDir)) or not isdir(partyDir):
+        return False
+    with open(manifestFile(party, storeDir), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != STORE_VERSION:
+        return False
+    return {splitext(file)[0] + '.parquet' for file in manifest['pages']} == set(listdir(partyDir))
+
+
+def writeManifest(party, manifest, storeDir=STORE_DIR):
+    file = manifestFile(party, storeDir)
+    with open(file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': STORE_VERSION, 'pages': manifest}, f, indent=1, sort_keys=True)
+    replace(file + '.tmp', file)
+
+
+def fileHash(file):
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Converts the page csv files of a party that are new or changed since the last ingest into their own parquet file in
+# the store, and removes the parquet files of csv files that are gone. A csv file with the same size and modification
+# time is not read at all, one with the same content hash is not parsed again. With full=True the store of the party
+# is rebuilt from scratch. Returns the names of the csv files that were ingested and of those that were removed
+def ingestParty(party, directory=None, storeDir=STORE_DIR, workers=None, full=False):
+    if directory is None:
+        directory = PARTY_DIRS[party]
+    outDir = partyStoreDir(party, storeDir)
+    if full and isdir(outDir):
+        shutil.rmtree(outDir)
+    oldManifest = readManifest(party, storeDir)
+    makedirs(outDir, exist_ok=True)
+
+    manifest = {}
+    changed = []
+    for file in listCsvs(directory):
+        fileStat = stat(join(directory, file))
+        entry = {'size': fileStat.st_size, 'mtime': fileStat.st_mtime_ns}
+        oldEntry = oldManifest.get(file)
+        ingested = oldEntry is not None and isfile(join(outDir, splitext(file)[0] + '.parquet'))
+        if ingested and oldEntry['size'] == entry['size'] and oldEntry['mtime'] == entry['mtime']:
+            manifest[file] = oldEntry
+            continue
+        entry['hash'] = fileHash(join(directory, file))
+        manifest[file] = entry
+        if not ingested or oldEntry['hash'] != entry['hash']:
+            changed.append(file)
+        else:
+            manifest[file] = dict(oldEntry, **entry)
+    removed = [file for file in oldManifest if file not in manifest]
+
+    for file in removed:
+        parquetFile = join(outDir, splitext(file)[0] + '.parquet')
+        if isfile(parquetFile):
+            remove(parquetFile)
+    parquetFiles = [join(outDir, splitext(file)[0] + '.parquet') for file in changed]
+    pageStats = mapFiles(ingestCsv, [join(directory, file) for file in changed], parquetFiles, workers=workers)
+    for file, stats in zip(changed, pageStats):
+        manifest[file].update(stats)
+
+    # The derived data refers to the positions of the ads of all pages, so it is rebuilt when any page changed
+    if (full or changed or removed) and isdir(derivedDir(party, storeDir)):
+        shutil.rmtree(derivedDir(party, storeDir))
+    writeManifest(party, manifest, storeDir)
+    return changed, removed
+
+
+def ingest(storeDir=STORE_DIR, workers=None, full=False):
+    for party, directory in PARTY_DIRS.items():
+        print('Ingesting ' + party + ' from ' + directory)
+        changed, removed = ingestParty(party, directory, storeDir, workers, full)
+        print('{} page files ingested, {} removed'.format(len(changed), len(removed)))
+
+
+# Ingests a party from scratch when it was not ingested yet, or when its store does not match its manifest or has
+# another STORE_VERSION (see `isIngested`). That also removes its derived data, so loaders of derived data call this
+# before reading it from the store
+def checkStore(party, storeDir=STORE_DIR):
+    if not isIngested(party, storeDir):
+        # The scripts have no `__main__` guard that a process pool needs, so ingest in this process
+        ingestParty(party, storeDir=storeDir, workers=1, full=True)
+
+
+# Returns the parquet files of the pages of a party, in the order their ads have in `loadAds`
+def pageFiles(party, storeDir=STORE_DIR):
+    checkStore(party, storeDir)
+    partyDir = partyStoreDir(party, storeDir)
+    return [join(partyDir, file) for file in sorted(listdir(partyDir))]
+
+
+# Returns the manifest entry of every page file of a party, in the order of `pageFiles`
+def pageEntries(party, storeDir=STORE_DIR):
+    files = pageFiles(party, storeDir)
+    entries = {splitext(file)[0] + '.parquet': entry for file, entry in readManifest(party, storeDir).items()}
+    return [entries[basename(file)] for file in files]
+
+
+# Returns the content hash of the csv of every page file of a party, in the order of `pageFiles`
+def pageHashes(party, storeDir=STORE_DIR):
+    return [entry['hash'] for entry in pageEntries(party, storeDir)]
+
+
+# Data computed from a single page is kept per content hash of the page csv, so it stays valid when other pages change
+# and can be subtracted again when its page changes
+def partialDir(party, kind, storeDir=STORE_DIR):
+    return join(storeDir, 'partials', party, kind)
+
+
+def partialFile(party, kind, pageHash, storeDir=STORE_DIR):
+    return join(partialDir(party, kind, storeDir), pageHash + '.parquet')
+
+
+# Removes the partials of pages that are no longer in the store
+def removeStalePartials(party, kind, hashes, storeDir=STORE_DIR):
+    directory = partialDir(party, kind, storeDir)
+    if not isdir(directory):
+        return
+    keep = set(hashes)
+    for file in listdir(directory):
+        if splitext(file)[0] not in keep:
+            remove(join(directory, file))
+
+
+# Returns dataframe of the ads of one page file, with only the requested columns
+def loadPage(file, columns=None):
+    return fillMissing(pd.read_parquet(file, columns=pageColumns(columns)))
+
+
+def pageColumns(columns):
+    if columns is None:
+        return None
+    return ['ad_archive_id'] + [column for column in columns if column != 'ad_archive_id']
+
+
+# Parquet gives missing strings back as None, the scripts expect NaN like pd.read_csv gives
+def fillMissing(df):
+    objectColumns = df.select_dtypes('object').columns
+    df[objectColumns] = df[objectColumns].fillna(np.nan)
+    return df
+
+
+# Yields the ads of one page file in dataframes of at most chunkSize (default CHUNK_ROWS) ads, with only the requested
+# columns. Only one chunk is in memory at a time
+def iterPage(file, columns=None, chunkSize=None):
+    for batch in pq.ParquetFile(file).iter_batches(batch_size=chunkSize or CHUNK_ROWS, columns=pageColumns(columns)):
+        yield fillMissing(batch.to_pandas())
+
+
+# Returns dataframe of all ads of a party, with only the requested columns read from the store
+def loadAds(party, columns=None, storeDir=STORE_DIR):
+    return concatFrames([loadPage(file, columns) for file in pageFiles(party, storeDir)])
+
+
+# Yields the ads of a party in dataframes of at most chunkSize ads, in the order of `loadAds`
+def iterAds(party, columns=None, chunkSize=None, storeDir=STORE_DIR):
+    for file in pageFiles(party, storeDir):
+        yield from iterPage(file, columns, chunkSize)
+
+
+# Returns the start (inclusive) and end (exclusive) of a year, or of a month of a year
+def monthRange(year, month=None):
+    if month is None:
+        return pd.Timestamp(int(year), 1, 1), pd.Timestamp(int(year) + 1, 1, 1)
+    start = pd.Timestamp(int(year), int(month), 1)
+    return start, start + pd.DateOffset(months=1)
+
+
+# Returns the slice of the positions of the dates from start (inclusive) to end (exclusive) in sorted dates, found by
+# binary search. None leaves that side open, missing dates are never included
+def dateSlice(dates, start=None, end=None):
+    dates = pd.Series(dates).to_numpy(dtype='datetime64[ns]')
+    last = len(dates) - np.isnat(dates).sum()
+    lower = 0 if start is None else np.searchsorted(dates[:last], np.datetime64(pd.Timestamp(start), 'ns'), 'left')
+    upper = last if end is None else np.searchsorted(dates[:last], np.datetime64(pd.Timestamp(end), 'ns'), 'left')
+    return slice(int(lower), int(upper))
+
+
+# Returns dataframe of the ads of a party with an ad_delivery_start_time from start (inclusive) to end (exclusive),
+# for example `loadAdsBetween('democrats', *monthRange(2020, 10))`. Pages without ads in the range are not read, the
+# others are sliced by binary search. The index is the position of the ad in `loadAds(party)`
+def loadAdsBetween(party, start=None, end=None, columns=None, storeDir=STORE_DIR):
+    files = pageFiles(party, storeDir)
+    entries = pageEntries(party, storeDir)
+    offsets = np.cumsum([0] + [entry['rows'] for entry in entries])
+    readColumns = columns if columns is None or SORT_COLUMN in columns else columns + [SORT_COLUMN]
+
+    dfs = []
+    for file, entry, offset in zip(files, entries, offsets):
+        if entry['first'] is None:
+            continue
+        if start is not None and pd.Timestamp(entry['last']) < pd.Timestamp(start):
+            continue
+        if end is not None and pd.Timestamp(entry['first']) >= pd.Timestamp(end):
+            continue
+        df = loadPage(file, readColumns)
+        rows = dateSlice(df[SORT_COLUMN], start, end)
+        df = df.iloc[rows]
+        df.index = pd.RangeIndex(offset + rows.start, offset + rows.stop)
+        dfs.append(df)
+    if len(dfs) == 0 and len(files) > 0:
+        dfs.append(loadPage(files[0], readColumns).iloc[:0])
+
+    df = concatFrames(dfs)
+    if readColumns is not columns:
+        df = df.drop(columns=SORT_COLUMN)
+    return df
+
+
+if __name__ == "__main__":
+    # usage: ad_store.py [workers] [--full]
+    args = [arg for arg in sys.argv[1:] if arg != '--full']
+    ingest(workers=int(args[0]) if len(args) > 0 else None, full='--full' in sys.argv[1:])
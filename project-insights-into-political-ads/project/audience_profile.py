@@ -0,0 +1,116 @@
+import numpy as np
+from os import makedirs
+from os.path import isfile, join
+from ad_store import loadAds, checkStore, derivedDir, PARTY_DIRS, STORE_DIR
+from distributions import loadDistribution
+
+
+# Returns shares[row, code]: the summed percentages of the entries of every ad per category of a key. Entries without
+# the key or without a percentage are left out. The shares are kept as float64, so a share that equals a threshold
+# compares the same as the sum of the percentages does
+def shareMatrix(entries, key, rowCount):
+    codes = entries[key].cat.codes.to_numpy().astype(np.int64)
+    percentages = entries['percentage'].to_numpy()
+    keep = (codes >= 0) & ~np.isnan(percentages)
+    categoryCount = len(entries[key].cat.categories)
+    keys = entries['row'].to_numpy()[keep].astype(np.int64) * categoryCount + codes[keep]
+    shares = np.bincount(keys, percentages[keep], minlength=rowCount * categoryCount)
+    return shares.reshape(rowCount, categoryCount)
+
+
+# Returns the largest percentage of a region entry of every ad, 0 for ads without region entries
+def topShares(entries, rowCount):
+    shares = np.zeros(rowCount, dtype=np.float64)
+    entries = entries.dropna(subset=['percentage'])
+    if len(entries) == 0:
+        return shares
+    # The entries are in the order of their ads, so every ad is one run of entries
+    rows = entries['row'].to_numpy()
+    starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    shares[rows[starts]] = np.maximum.reduceat(entries['percentage'].to_numpy(), starts)
+    return shares
+
+
+class AudienceProfile:
+    """
+    Audience of every ad of a party (rows in the order of `loadAds(party)`) as float64 arrays: the share of every gender
+    and of every age bucket, and the share of its largest region. Ads without entries have share 0 everywhere, see
+    `hasDemographic` and `hasRegion`.
+    """
+    def __init__(self, genders, ages, genderShares, ageShares, topRegionShares, hasDemographic, hasRegion):
+        self.genders = list(genders)
+        self.ages = list(ages)
+        self.genderShares = genderShares
+        self.ageShares = ageShares
+        self.topRegionShares = topRegionShares
+        self.hasDemographic = hasDemographic
+        self.hasRegion = hasRegion
+
+    @classmethod
+    def fromDistributions(cls, demographic, region, rowCount):
+        hasDemographic = np.zeros(rowCount, dtype=bool)
+        hasDemographic[demographic['row'].to_numpy()] = True
+        hasRegion = np.zeros(rowCount, dtype=bool)
+        hasRegion[region['row'].to_numpy()] = True
+        return cls(demographic['gender'].cat.categories, demographic['age'].cat.categories,
+                   shareMatrix(demographic, 'gender', rowCount), shareMatrix(demographic, 'age', rowCount),
+                   topShares(region, rowCount), hasDemographic, hasRegion)
+
+    @classmethod
+    def load(cls, file):
+        data = np.load(file, allow_pickle=False)
+        return cls(data['genders'], data['ages'], data['genderShares'], data['ageShares'], data['topRegionShares'],
+                   data['hasDemographic'], data['hasRegion'])
+
+    def save(self, file):
+        np.savez(file, genders=np.array(self.genders, dtype=str), ages=np.array(self.ages, dtype=str),
+                 genderShares=self.genderShares, ageShares=self.ageShares, topRegionShares=self.topRegionShares,
+                 hasDemographic=self.hasDemographic, hasRegion=self.hasRegion)
+
+    def shares(self, gender=None, age=None):
+        """
+        Returns the share of a gender or of an age bucket for every ad. Without either it returns the share of the
+        largest region.
+        """
+        if gender is not None:
+            return self.genderShares[:, self.genders.index(gender)]
+        if age is not None:
+            return self.ageShares[:, self.ages.index(age)]
+        return self.topRegionShares
+
+    def countAbove(self, thresholds, gender=None, age=None, mask=None):
+        """
+        Returns the amount of ads (of those in mask) with a share larger than every threshold, from one sort of the
+        shares and a binary search per threshold.
+        """
+        shares = self.shares(gender, age)
+        if mask is not None:
+            shares = shares[mask]
+        shares = np.sort(shares)
+        return len(shares) - np.searchsorted(shares, np.asarray(thresholds, dtype=np.float64), 'right')
+
+
+# The profiles of the first version held float32 shares, they are built again
+def profileFile(party, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), 'audience-profile-2.npz')
+
+
+# Returns the audience profile of the ads of a party. It is built once and then read from the store
+def loadAudienceProfile(party, storeDir=STORE_DIR):
+    checkStore(party, storeDir)
+    file = profileFile(party, storeDir)
+    if isfile(file):
+        return AudienceProfile.load(file)
+
+    rowCount = len(loadAds(party, ['ad_archive_id'], storeDir))
+    profile = AudienceProfile.fromDistributions(loadDistribution(party, 'demographic_distribution', storeDir),
+                                                loadDistribution(party, 'delivery_by_region', storeDir), rowCount)
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    profile.save(file)
+    return profile
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        print('Building the audience profile of ' + party)
+        loadAudienceProfile(party)
@@ -0,0 +1,262 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from ad_cube import rollUp, adsColumn, hasColumn
+from ad_store import RANGE_COLUMNS
+
+# Every figure function takes the cubes it needs (see `ad_cube.py`) and returns a list of figures, so the cubes can be
+# loaded once and shared by many charts (see `report.py`)
+
+
+def to_units(x):
+    units = {-12: "T", -9: "B", -6: "M", -3: "K", 0: "", 3: "m", 6: "µ", 9: "n", 12: "p", 15: "f"}
+    k = -12
+    while x * 10.0 ** k < 1:
+        k += 3
+    return f"{x * 10.0 ** k:1,.3f}{units[k]}"
+
+
+# One bar chart with both parties of the amount of ads per value of a column, the values after the largest
+# amountNonOtherBars grouped into 'Other'. The values of a range column are its range strings, counted in the 'ranges'
+# cube
+def barchartFigures(adsCube, rangesCube, column, amountNonOtherBars=9):
+    cube, dimension = (rangesCube[rangesCube['column'] == column], 'range') if column in RANGE_COLUMNS else \
+        (adsCube, column)
+    totals = {}
+    filledIn = {}
+    partyCountResults = []
+    for party in ['Democrats', 'Republicans']:
+        totals[party] = adsCube[adsCube['party'] == party.lower()]['ads'].sum()
+        df = cube[cube['party'] == party.lower()].dropna(subset=[dimension])
+        filledIn[party] = df['ads'].sum()
+        # Grouped as text, so values with the same amount of ads are in the order of the text like the csv gave them
+        countResult = rollUp(df.astype({dimension: 'object'}), dimension, ['ads'])
+        countResult = countResult.rename(columns={dimension: column, 'ads': 'count'}).astype({'count': 'int64'})
+        countResult = countResult.assign(Party=party)
+        countResult = countResult.sort_values(by='count', ascending=False)
+
+        nonOtherBars = countResult.iloc[:amountNonOtherBars, :]
+        otherBar = countResult.iloc[amountNonOtherBars:, :]
+        otherRow = pd.Series({
+            column: 'Other',
+            'count': otherBar['count'].sum(),
+            'Party': party
+        })
+        result = pd.concat([
+            nonOtherBars,
+            pd.DataFrame([otherRow], columns=otherRow.index)]
+        ).reset_index(drop=True)
+        partyCountResults.append(result)
+
+    fig = px.histogram(
+        pd.concat(partyCountResults),
+        x='Party',
+        y='count',
+        color=column,
+        title="Ads with " + column + ' data: Democrats: ' +
+              str(round(filledIn['Democrats'] / totals['Democrats'] * 100)) + '%, Republicans: ' +
+              str(round(filledIn['Republicans'] / totals['Republicans'] * 100)) + '%.',
+        text_auto=True,
+        barmode='group'
+    )
+    fig.update_layout(
+        yaxis_title=column.capitalize(),
+        font_size=30
+    )
+    return [fig]
+
+
+# A bar chart per party of the amount of ads (weighted by the percentage of every demographic entry) per value of a
+# simple column and per age or gender. Values with less than 5% of the ads are left out
+def demographicSimpleFigures(adsCube, demographicCube, metricColumn, groupByColumn,
+                             demographicColumn='demographic_distribution'):
+    figures = []
+    for party in ['Democrats', 'Republicans']:
+        ads = adsCube[adsCube['party'] == party.lower()]
+        totalRecords = ads['ads'].sum()
+        # Ads with demographic entries and a value for the metric column
+        filled = ads[ads[hasColumn(demographicColumn)]].dropna(subset=[metricColumn])['ads'].sum()
+
+        df = demographicCube[demographicCube['party'] == party.lower()].dropna(subset=[metricColumn])
+        countResult = rollUp(df, [metricColumn, groupByColumn], ['ads'])
+        countResult = countResult.rename(columns={'ads': 'amount'})
+        countResult = countResult.assign(Party=party)
+
+        finalDfs = []
+        for _, df in countResult.groupby([metricColumn], observed=True):
+            df = df.sort_values(by=groupByColumn)
+            if df['amount'].sum() < (0.05 * filled):
+                continue
+            finalDfs.append(df)
+
+        titleColumn = metricColumn
+        if metricColumn == 'publisher_platforms':
+            titleColumn = 'Advertising platforms'
+
+        fig = px.histogram(
+            pd.concat(finalDfs),
+            x=metricColumn,
+            y='amount',
+            color=groupByColumn,
+            title=party + '. ' + titleColumn + ' grouped by ' + groupByColumn + '. Ads with ' + titleColumn + ' and ' +
+                  groupByColumn + ' data: ' + str(round(filled / totalRecords * 100)) + '%.',
+            text_auto=True,
+            barmode='group'
+        )
+        fig.update_layout(
+            yaxis_title='Amount of ads'
+        )
+        figures.append(fig)
+    return figures
+
+
+# One bar chart with both parties of a metric column (the average of its bounds, weighted by the percentage of every
+# demographic entry) per age or gender
+def demographicMetricFigures(adsCube, demographicCube, metricColumn, groupByColumn,
+                             demographicColumn='demographic_distribution'):
+    totals = {}
+    filledIn = {}
+    partyCountResults = []
+    for party in ['Democrats', 'Republicans']:
+        ads = adsCube[adsCube['party'] == party.lower()]
+        totals[party] = ads['ads'].sum()
+        # Ads with demographic entries and the metric
+        filledIn[party] = ads[ads[hasColumn(demographicColumn)]][adsColumn(metricColumn)].sum()
+
+        df = demographicCube[demographicCube['party'] == party.lower()]
+        countResult = rollUp(df, groupByColumn, [metricColumn, adsColumn(metricColumn)])
+        # Only the groups with ads that have the metric
+        countResult = countResult[countResult[adsColumn(metricColumn)] > 0][[groupByColumn, metricColumn]]
+        countResult = countResult.assign(Party=party)
+        partyCountResults.append(countResult.sort_values(by=groupByColumn))
+
+    fig = px.histogram(
+        pd.concat(partyCountResults),
+        x='Party',
+        y=metricColumn,
+        color=groupByColumn,
+        title=metricColumn.capitalize() + ' grouped by ' + groupByColumn + '. Ads with ' + metricColumn + ' and ' +
+              groupByColumn + ' data: Democrats: ' + str(round(filledIn['Democrats'] / totals['Democrats'] * 100)) +
+              '%, Republicans: ' + str(round(filledIn['Republicans'] / totals['Republicans'] * 100)) + '%.',
+        text_auto=True,
+        barmode='group'
+    )
+    fig.update_layout(
+        yaxis_title=metricColumn.capitalize(), font_size=28
+    )
+    return [fig]
+
+
+# The measure of the region sums that holds the amount of ads (weighted by percentage) that have the metric, or of all
+# ads without a metric
+def geomapMeasure(metricColumn):
+    return adsColumn(metricColumn) if metricColumn != '' else 'ads'
+
+
+# The measures that `geomapFigures` needs from the region sums (see `regions.py`)
+def geomapMeasures(metricColumn):
+    return [column for column in [geomapMeasure(metricColumn), metricColumn] if column != '']
+
+
+# A map per party with a marker per region, sized by the sum of a metric column (or by the percentage of the ads
+# without a metric)
+def geomapFigures(adsCube, regionSums, metricColumn, stateColumn='delivery_by_region'):
+    adsMeasure = geomapMeasure(metricColumn)
+    figures = []
+    for party in ['Democrats', 'Republicans']:
+        ads = adsCube[adsCube['party'] == party.lower()]
+        totalRecords = ads['ads'].sum()
+        filledInRecords = ads[ads[hasColumn(stateColumn)]][adsMeasure].sum()
+
+        df = regionSums.partyFrame(party.lower())
+        df = df[(df[adsMeasure] > 0) & regionSums.matched()].rename(columns={adsMeasure: 'percentage'})
+        df['percentage'] = df['percentage'] / filledInRecords * 100
+        df = df.rename(columns={'region': 'state'})
+
+        countColumn = 'percentage'
+        if metricColumn != '':
+            countColumn = metricColumn
+
+        df['formattedData'] = df[countColumn].apply(to_units)
+        df['summary'] = (
+                "<b>" + df['state'] + "</b><br>" +
+                countColumn.capitalize() + ": " + df['formattedData']
+        )
+
+        sumOfCount = to_units(df.sum()[countColumn])
+
+        fig = go.Figure(data=go.Scattergeo(
+            locationmode='USA-states',
+            hovertemplate=
+            "%{text}<extra></extra>",
+            text=df['summary'],
+            textposition="top center",
+            mode='markers+text',
+            lat=df['lat'],
+            lon=df['lon'],
+            marker=dict(
+                size=df[countColumn] / df[countColumn].max() * 60,
+                reversescale=True,
+                autocolorscale=False,
+                symbol='circle',
+                line=dict(
+                    width=0.5,
+                    color='rgba(0, 0, 0)'
+                ),
+                colorscale='plasma',
+                cmin=0,
+                color=df[countColumn],
+                cmax=df[countColumn].max(),
+                colorbar_title=countColumn
+            )
+        ))
+
+        fig.update_layout(
+            title='Distribution ' + countColumn + ' of ads of ' + party + '. Ads with ' + countColumn + ' data: ' + str(
+                round(filledInRecords / totalRecords * 100)) + '%. Total ' + countColumn + ': ' + str(sumOfCount),
+            geo=dict(
+                scope='usa',
+                projection_type='albers usa',
+                showland=True,
+                landcolor="rgb(250, 250, 250)",
+                subunitcolor="rgb(217, 217, 217)",
+                countrycolor="rgb(217, 217, 217)",
+                countrywidth=0.5,
+                subunitwidth=0.5
+            ),
+            font_size=13
+        )
+        figures.append(fig)
+    return figures
+
+
+# One bar chart with both parties of the sum of a metric column per year of ad_delivery_start_time
+def spendPerYearFigures(adsCube, metricColumn='spend'):
+    totals = {}
+    filledIn = {}
+    partyCountResults = []
+    for party in ['Democrats', 'Republicans']:
+        df = adsCube[adsCube['party'] == party.lower()]
+        totals[party] = df['ads'].sum()
+        df = df.dropna(subset=['day'])
+        filledIn[party] = df[adsColumn(metricColumn)].sum()
+
+        df = df.assign(Date=df['day'].dt.year.astype(str))
+        df = rollUp(df, 'Date', [metricColumn, adsColumn(metricColumn)])
+        # Only the years with ads that have the metric
+        df = df[df[adsColumn(metricColumn)] > 0][['Date', metricColumn]]
+        partyCountResults.append(df.assign(Party=party))
+
+    fig = px.bar(
+        pd.concat(partyCountResults),
+        x='Date',
+        y=metricColumn,
+        color='Party',
+        title='Spend per party per year. Democrats filled in: ' +
+              str(round(filledIn['Democrats'] / totals['Democrats'] * 100)) + '%. Republicans filled in: ' +
+              str(round(filledIn['Republicans'] / totals['Republicans'] * 100)) + '%.',
+        barmode='group',
+        text_auto=True
+    )
+    fig.update_layout(font_size=30)
+    return [fig]
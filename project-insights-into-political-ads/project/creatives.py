@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+from os import makedirs
+from os.path import isfile, join
+from ad_store import iterAds, checkStore, derivedDir, uniqueRows, PARTY_DIRS, STORE_DIR, TEXT_COLUMNS
+from keyword_index import tokenize
+
+# Amount of consecutive words that make up a shingle of a text, texts with fewer words are one shingle
+SHINGLE_SIZE = 3
+# Amount of hash functions of a MinHash signature, split into LSH bands of BAND_SIZE hashes. Two creatives are
+# compared when all hashes of one band are equal, which happens for most pairs with a similarity above
+# (1 / bands) ** (1 / BAND_SIZE), about 0.5
+HASH_COUNT = 64
+BAND_SIZE = 4
+# Fraction of equal signature hashes (the estimated Jaccard similarity of the shingles) from which two creatives are
+# near duplicates
+SIMILARITY = 0.7
+# Amount of shingles that are hashed at once. Every chunk takes a (CHUNK_SIZE, HASH_COUNT) uint64 array, about 50 MB
+CHUNK_SIZE = 100000
+
+
+# Returns the shingles of every text as a series indexed by the position of the text
+def shingles(texts):
+    words = tokenize(pd.Series(texts, dtype=object).reset_index(drop=True))
+    words = words.map(lambda tokens: [' '.join(tokens[i:i + SHINGLE_SIZE])
+                                      for i in range(max(len(tokens) - SHINGLE_SIZE + 1, 1))] if tokens else [])
+    return words.explode().dropna()
+
+
+# Returns the MinHash signature (HASH_COUNT uint32 hashes) of the shingles of every text, the rows of texts without
+# shingles are all ones. The shingles are hashed to 64 bits once, every hash function is then a multiply-shift hash of
+# that value
+def minHashes(texts, seed=42):
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, HASH_COUNT, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    increments = rng.integers(0, 2 ** 63, HASH_COUNT, dtype=np.uint64)
+    signatures = np.full((len(texts), HASH_COUNT), np.iinfo(np.uint32).max, dtype=np.uint32)
+
+    found = shingles(texts)
+    for start in range(0, len(found), CHUNK_SIZE):
+        chunk = found.iloc[start:start + CHUNK_SIZE]
+        values = pd.util.hash_array(chunk.to_numpy(dtype=object))
+        # The hash functions are applied in place, so the chunk needs one uint64 array
+        hashes = np.multiply(values[:, None], multipliers)
+        hashes += increments
+        hashes >>= np.uint64(32)
+        hashes = hashes.astype(np.uint32)
+        # The shingles of a text are consecutive, and a text can continue in the next chunk
+        rows = chunk.index.to_numpy()
+        starts = np.flatnonzero(np.diff(rows, prepend=-1))
+        signatures[rows[starts]] = np.minimum(signatures[rows[starts]], np.minimum.reduceat(hashes, starts))
+    return signatures
+
+
+# Returns the connected component of every node of an undirected graph with nodeCount nodes and edges (u[i], v[i]),
+# numbered from 0 in the order of their smallest node. Every round hooks the larger root of every edge onto the smaller
+# one and then compresses the paths, until the roots of all edges are equal. This is the union-find of
+# `connected_components` in structures/disclaimer_graph.py, the project scripts are run on their own and can not import
+# it
+def connectedComponents(u, v, nodeCount):
+    parent = np.arange(nodeCount)
+    while True:
+        ru = parent[u]
+        rv = parent[v]
+        differ = ru != rv
+        if not differ.any():
+            break
+        np.minimum.at(parent, np.maximum(ru, rv)[differ], np.minimum(ru, rv)[differ])
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+    return np.unique(parent, return_inverse=True)[1]
+
+
+# Returns the near duplicate cluster of every text. The signatures are split into bands, the texts with the same
+# hashes in a band are compared with the first text with those hashes, and texts with at least SIMILARITY equal hashes
+# are linked. Clusters are the connected texts, numbered in the order of their first text. Texts without words are
+# clusters of their own
+def clusterTexts(texts):
+    signatures = minHashes(texts)
+    empty = (signatures == np.iinfo(np.uint32).max).all(axis=1)
+    u = []
+    v = []
+    for start in range(0, HASH_COUNT, BAND_SIZE):
+        buckets = uniqueRows(pd.DataFrame(signatures[:, start:start + BAND_SIZE]), range(BAND_SIZE))[1]
+        first = np.unique(buckets, return_index=True)[1][buckets]
+        candidates = np.flatnonzero((first != np.arange(len(texts))) & ~empty)
+        similarity = (signatures[candidates] == signatures[first[candidates]]).mean(axis=1)
+        linked = candidates[similarity >= SIMILARITY]
+        u.append(linked)
+        v.append(first[linked])
+    if len(texts) == 0:
+        return np.empty(0, dtype=np.int64)
+    return connectedComponents(np.concatenate(u), np.concatenate(v), len(texts))
+
+
+# Returns the text of every creative (distinct rows of text columns): the texts of the columns joined with a space
+def creativeTexts(creatives, columns=TEXT_COLUMNS):
+    texts = creatives[columns[0]].fillna('').astype(str)
+    for column in columns[1:]:
+        texts = texts + ' ' + creatives[column].fillna('').astype(str)
+    return texts.to_numpy(dtype=object)
+
+
+class Creatives:
+    """
+    Creative of every ad of a party (rows in the order of `loadAds(party)`): ads with the same texts in all
+    TEXT_COLUMNS share a creative, and creatives with nearly the same texts (found with MinHash and LSH, see
+    `clusterTexts`) share a cluster. A cluster is one message that ran with small variations.
+    """
+    def __init__(self, adCreatives, creativeClusters):
+        self.adCreatives = adCreatives
+        self.creativeClusters = creativeClusters
+
+    @classmethod
+    def fromChunks(cls, chunks, columns=TEXT_COLUMNS):
+        """
+        Builds the creatives from consecutive dataframes of ads (see `iterAds`). Only the distinct texts are kept in
+        memory.
+        """
+        creatives = {}
+        adCreatives = []
+        for chunk in chunks:
+            unique, keys, _ = uniqueRows(chunk, columns)
+            # Missing texts become None, so equal creatives of different chunks are equal tuples
+            unique = unique[columns].astype(object)
+            rows = unique.where(unique.notna(), None).itertuples(index=False, name=None)
+            codes = np.array([creatives.setdefault(row, len(creatives)) for row in rows], dtype=np.int32)
+            adCreatives.append(codes[keys])
+        texts = creativeTexts(pd.DataFrame(list(creatives), columns=columns), columns)
+        adCreatives = np.concatenate(adCreatives) if adCreatives else np.empty(0, dtype=np.int32)
+        return cls(adCreatives, clusterTexts(texts).astype(np.int32))
+
+    @classmethod
+    def load(cls, file):
+        data = np.load(file)
+        return cls(data['adCreatives'], data['creativeClusters'])
+
+    def save(self, file):
+        np.savez(file, adCreatives=self.adCreatives, creativeClusters=self.creativeClusters)
+
+    def adClusters(self):
+        return self.creativeClusters[self.adCreatives]
+
+    def creativeCounts(self):
+        """
+        Returns the amount of ads of every creative.
+        """
+        return np.bincount(self.adCreatives, minlength=len(self.creativeClusters))
+
+    def distinctCounts(self, mask=None):
+        """
+        Returns the amount of ads, of distinct creatives and of distinct messages (clusters) of the ads (of those in
+        mask).
+        """
+        creatives = self.adCreatives if mask is None else self.adCreatives[mask]
+        return len(creatives), len(np.unique(creatives)), len(np.unique(self.creativeClusters[creatives]))
+
+
+def creativesFile(party, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), 'creatives.npz')
+
+
+# Returns the creatives of the ads of a party. They are found once and then read from the store
+def loadCreatives(party, storeDir=STORE_DIR):
+    checkStore(party, storeDir)
+    file = creativesFile(party, storeDir)
+    if isfile(file):
+        return Creatives.load(file)
+
+    creatives = Creatives.fromChunks(iterAds(party, TEXT_COLUMNS, storeDir=storeDir))
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    creatives.save(file)
+    return creatives
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        ads, creatives, messages = loadCreatives(party).distinctCounts()
+        print(party.capitalize() + ': ' + str(ads) + ' ads, ' + str(creatives) + ' distinct creatives, ' +
+              str(messages) + ' distinct messages')
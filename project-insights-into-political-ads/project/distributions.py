@@ -0,0 +1,144 @@
+import json
+import numpy as np
+import pandas as pd
+from os import makedirs
+from os.path import isfile, join
+from ad_store import checkStore, concatFrames, derivedDir, iterPage, mapFiles, pageEntries, pageFiles, pageHashes, \
+    partialDir, partialFile, removeStalePartials, PARTY_DIRS, STORE_DIR
+
+# orjson is a lot faster for the millions of small objects, the standard json module is used when it is not installed
+try:
+    import orjson
+    jsonLoads = orjson.loads
+except ImportError:
+    jsonLoads = json.loads
+
+# Keys of the entries of the distribution columns, next to `percentage`
+DISTRIBUTION_KEYS = {
+    'demographic_distribution': ['age', 'gender'],
+    'delivery_by_region': ['region'],
+}
+
+
+# Turns a distribution column ('{"percentage": .., "age": .., "gender": ..}, {...}' per ad) into long format: one row
+# per entry with the position of its ad (`row`), the keys as categories and the percentage. Cells that are missing or
+# can not be parsed give no entries
+def explodeDistribution(series, keys):
+    cells = series.to_numpy(dtype='object')
+
+    # Every entry is one object, so the amount of '{' is enough room for all of them
+    capacity = int(series.astype('object').str.count('{').sum())
+    rows = np.empty(capacity, dtype=np.int32)
+    percentages = np.empty(capacity, dtype=np.float64)
+    keyCodes = {key: np.empty(capacity, dtype=np.int32) for key in keys}
+    keyValues = {key: {} for key in keys}
+
+    n = 0
+    for row, cell in enumerate(cells):
+        if not isinstance(cell, str):
+            continue
+        try:
+            entries = jsonLoads('[' + cell + ']')
+        except ValueError:
+            continue
+
+        for entry in entries:
+            rows[n] = row
+            percentage = entry.get('percentage')
+            percentages[n] = np.nan if percentage is None else float(percentage)
+            for key in keys:
+                value = entry.get(key)
+                if value is None:
+                    keyCodes[key][n] = -1
+                else:
+                    keyCodes[key][n] = keyValues[key].setdefault(value, len(keyValues[key]))
+            n += 1
+
+    df = pd.DataFrame({'row': rows[:n]})
+    for key in keys:
+        categories = list(keyValues[key])
+        df[key] = pd.Categorical.from_codes(keyCodes[key][:n], categories=categories).reorder_categories(
+            sorted(categories))
+    df['percentage'] = percentages[:n]
+    return df
+
+
+def distributionFile(party, column, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), column + '.parquet')
+
+
+# Concatenates the long formats of chunks of ads, the categories are sorted again
+def concatEntries(dfs, keys):
+    if len(dfs) == 0:
+        dfs.append(explodeDistribution(pd.Series([], dtype='object'), keys))
+    df = concatFrames(dfs).reset_index(drop=True)
+    for key in keys:
+        df[key] = df[key].cat.reorder_categories(sorted(df[key].cat.categories))
+    return df
+
+
+# Parses all distribution columns of one page file in one pass, a chunk of ads at a time, and saves the long format of
+# every column to its partial. `row` is the position of the ad in the page
+def explodePage(file, partials):
+    dfs = {column: [] for column in partials}
+    offset = 0
+    for ads in iterPage(file, list(partials)):
+        for column in partials:
+            chunk = explodeDistribution(ads[column], DISTRIBUTION_KEYS[column])
+            chunk['row'] += offset
+            dfs[column].append(chunk)
+        offset += len(ads)
+    for column, partial in partials.items():
+        concatEntries(dfs[column], DISTRIBUTION_KEYS[column]).to_parquet(partial, index=False)
+
+
+# Parses the distribution columns of the pages of a party that are not parsed yet. The long format of every page is
+# kept in the store, so the cubes and `loadDistribution` share it and only new or changed pages are parsed again
+def explodePages(party, storeDir=STORE_DIR, workers=1):
+    files = pageFiles(party, storeDir)
+    hashes = pageHashes(party, storeDir)
+    for column in DISTRIBUTION_KEYS:
+        makedirs(partialDir(party, column, storeDir), exist_ok=True)
+    missing = {pageHash: page for page, pageHash in zip(files, hashes)
+               if not all(isfile(partialFile(party, column, pageHash, storeDir)) for column in DISTRIBUTION_KEYS)}
+    mapFiles(explodePage, list(missing.values()),
+             [{column: partialFile(party, column, pageHash, storeDir) for column in DISTRIBUTION_KEYS}
+              for pageHash in missing], workers=workers)
+    return hashes
+
+
+# Returns the long format of a distribution column of a party. It is parsed once and then read from the store. `row`
+# is the position of the ad in `loadAds(party)`
+def loadDistribution(party, column, storeDir=STORE_DIR, workers=1):
+    checkStore(party, storeDir)
+    file = distributionFile(party, column, storeDir)
+    if isfile(file):
+        return pd.read_parquet(file)
+
+    hashes = explodePages(party, storeDir, workers)
+    offsets = np.cumsum([0] + [entry['rows'] for entry in pageEntries(party, storeDir)])
+    dfs = []
+    for pageHash, offset in zip(hashes, offsets):
+        df = pd.read_parquet(partialFile(party, column, pageHash, storeDir))
+        df['row'] += int(offset)
+        dfs.append(df)
+    df = concatEntries(dfs, DISTRIBUTION_KEYS[column])
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    df.to_parquet(file, index=False)
+    removeStalePartials(party, column, hashes, storeDir)
+    return df
+
+
+# Adds columns of the ads to the entries of a distribution, matched on `row`
+def attachAdColumns(df, ads, columns):
+    rows = df['row'].to_numpy()
+    for column in columns:
+        df[column] = ads[column].iloc[rows].array
+    return df
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        for column in DISTRIBUTION_KEYS:
+            print('Parsing ' + column + ' of ' + party)
+            loadDistribution(party, column, workers=None)
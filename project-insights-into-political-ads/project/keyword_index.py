@@ -0,0 +1,167 @@
+import re
+import numpy as np
+import pandas as pd
+from functools import reduce
+from os import makedirs
+from os.path import isfile, join
+from ad_store import iterAds, checkStore, derivedDir, expandUnique, uniqueRows, PARTY_DIRS, STORE_DIR, TEXT_COLUMNS
+
+# Amount of ads that are tokenized at once while building an index
+CHUNK_SIZE = 100000
+# Characters removed from the text before it is split on whitespace, the same as `rank_file_maker.py` does
+PUNCTUATION = r'[^\w\s]'
+# Rows are stored as uint32, a (token, row) pair is kept as one int64 key: code * ROW_LIMIT + row
+ROW_LIMIT = 1 << 32
+
+
+# Returns the lower case tokens of a text without punctuation
+def normalize(text):
+    return re.sub(PUNCTUATION, '', text.lower()).split()
+
+
+# `normalize` for every text of a series
+def tokenize(series):
+    return series.str.lower().str.replace(PUNCTUATION, '', regex=True).str.split()
+
+
+class KeywordIndex:
+    """
+    Inverted index from normalized token to the sorted rows (positions in `loadAds(party)`) of the ads that contain the
+    token in one of the creative text columns. The posting lists are stored delta encoded, one after another.
+    """
+    def __init__(self, tokens, offsets, deltas, rowCount):
+        # tokens are sorted, the postings of tokens[i] are deltas[offsets[i]:offsets[i + 1]]
+        self.tokens = tokens
+        self.offsets = offsets
+        self.deltas = deltas
+        self.rowCount = rowCount
+
+    @classmethod
+    def fromAds(cls, df, columns=TEXT_COLUMNS):
+        """
+        Builds the index from the text columns of a dataframe of ads, tokenizing `CHUNK_SIZE` ads at a time.
+        """
+        return cls.fromChunks((df.iloc[start:start + CHUNK_SIZE] for start in range(0, len(df), CHUNK_SIZE)), columns)
+
+    @classmethod
+    def fromChunks(cls, chunks, columns=TEXT_COLUMNS):
+        """
+        Builds the index from consecutive dataframes of ads (see `iterAds`), so only one chunk of texts is in memory.
+        Every distinct text of a column is tokenized once.
+        """
+        rowCount = 0
+        vocabulary = {}
+        keys = []
+        for chunk in chunks:
+            for column in columns:
+                texts, textKeys, textCounts = uniqueRows(chunk, [column])
+                texts = texts[column].reset_index(drop=True)
+                tokens = tokenize(texts.dropna().astype(str)).explode().dropna()
+                if tokens.empty:
+                    continue
+                # Only the distinct tokens of the chunk go through the vocabulary
+                localCodes, localTokens = pd.factorize(tokens)
+                codes = np.array([vocabulary.setdefault(token, len(vocabulary)) for token in localTokens],
+                                 dtype=np.int64)[localCodes]
+                # One (token, text) pair per token of a text, then a key per (token, row) pair for every ad with the
+                # text
+                pairs = np.unique(codes * len(texts) + tokens.index.to_numpy())
+                items, rows = expandUnique(textKeys, textCounts, pairs % len(texts))
+                keys.append((pairs // len(texts))[items] * ROW_LIMIT + rowCount + rows)
+            rowCount += len(chunk)
+
+        # Sort the vocabulary and renumber the codes to match
+        tokens = np.array(list(vocabulary), dtype=object)
+        order = np.argsort(tokens)
+        renumber = np.empty(len(order), dtype=np.int64)
+        renumber[order] = np.arange(len(order))
+        tokens = tokens[order]
+
+        keys = np.unique(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+        codes = renumber[keys // ROW_LIMIT]
+        rows = keys % ROW_LIMIT
+        order = np.lexsort((rows, codes))
+        codes = codes[order]
+        rows = rows[order]
+
+        offsets = np.searchsorted(codes, np.arange(len(tokens) + 1))
+        deltas = np.diff(rows, prepend=0)
+        # Every posting list starts with its absolute row
+        deltas[offsets[:-1]] = rows[offsets[:-1]]
+        return cls(tokens, offsets, deltas.astype(np.uint32), rowCount)
+
+    @classmethod
+    def load(cls, file):
+        data = np.load(file)
+        # Tokens never contain whitespace, so they are stored as one newline separated text
+        text = data['tokens'].tobytes().decode('utf-8')
+        tokens = np.array(text.split('\n') if text else [], dtype=object)
+        return cls(tokens, data['offsets'], data['deltas'], int(data['rowCount']))
+
+    def save(self, file):
+        tokens = np.frombuffer('\n'.join(self.tokens).encode('utf-8'), dtype=np.uint8)
+        np.savez_compressed(file, tokens=tokens, offsets=self.offsets, deltas=self.deltas, rowCount=self.rowCount)
+
+    def rows(self, token):
+        """
+        Returns the sorted rows of the ads that contain a normalized token.
+        """
+        i = np.searchsorted(self.tokens, token)
+        if i == len(self.tokens) or self.tokens[i] != token:
+            return np.empty(0, dtype=np.int64)
+        return np.cumsum(self.deltas[self.offsets[i]:self.offsets[i + 1]], dtype=np.int64)
+
+    def allOf(self, keywords):
+        """
+        Returns the rows of the ads that contain every token of the keywords. A keyword of multiple words matches ads
+        that contain all of its words.
+        """
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        postings = [self.rows(token) for keyword in keywords for token in normalize(keyword)]
+        if len(postings) == 0:
+            return np.empty(0, dtype=np.int64)
+        # Intersect starting with the shortest posting list
+        postings.sort(key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), postings)
+
+    def anyOf(self, keywords):
+        """
+        Returns the rows of the ads that match at least one of the keywords, each keyword matched like `allOf`.
+        """
+        postings = [self.allOf(keyword) for keyword in keywords]
+        if len(postings) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(postings))
+
+    def matchBitsets(self, keywords):
+        """
+        Returns, for every row, a bitset with bit i set when the ad matches keyword i (see `unpackMatches`).
+        """
+        matches = np.zeros((self.rowCount, len(keywords)), dtype=bool)
+        for i, keyword in enumerate(keywords):
+            matches[self.allOf(keyword), i] = True
+        return np.packbits(matches, axis=1, bitorder='little')
+
+
+def indexFile(party, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), 'keyword-index.npz')
+
+
+# Returns the keyword index of a party. It is built once and then read from the store
+def loadKeywordIndex(party, storeDir=STORE_DIR):
+    checkStore(party, storeDir)
+    file = indexFile(party, storeDir)
+    if isfile(file):
+        return KeywordIndex.load(file)
+
+    index = KeywordIndex.fromChunks(iterAds(party, TEXT_COLUMNS, storeDir=storeDir))
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    index.save(file)
+    return index
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        print('Indexing ' + party)
+        loadKeywordIndex(party)
@@ -0,0 +1,113 @@
+import re
+import numpy as np
+import pandas as pd
+from ad_store import iterAds, STORE_DIR, TEXT_COLUMNS
+from keyword_index import loadKeywordIndex
+
+
+# Returns a regex that matches the longest of the words that starts at a position. The words are put in a trie and the
+# trie is written out as nested groups, so the regex engine walks the trie instead of trying every word
+def trieRegex(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return nodeRegex(trie)
+
+
+def nodeRegex(node):
+    branches = [re.escape(char) + nodeRegex(child) for char, child in sorted(node.items()) if char != '']
+    if len(branches) == 0:
+        return ''
+    regex = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # A word ends here, the greedy ? first tries the longer words below
+        regex = '(?:' + regex + ')?'
+    return regex
+
+
+# Packs a boolean (ads x keywords) matrix into bitsets of one bit per keyword
+def packMatches(matches):
+    return np.packbits(matches, axis=1, bitorder='little')
+
+
+# Unpacks bitsets into a boolean (ads x keywords) matrix
+def unpackMatches(bitsets, keywordCount):
+    return np.unpackbits(bitsets, axis=1, count=keywordCount, bitorder='little').astype(bool)
+
+
+class KeywordMatcher:
+    """
+    Finds which of a list of keywords occur in a text as a substring, like `str.contains(keyword)` does for every
+    keyword, but in a single scan of the text for all keywords together (an Aho-Corasick style trie automaton).
+    """
+    def __init__(self, keywords, ignoreCase=False):
+        self.keywords = list(keywords)
+        self.ignoreCase = ignoreCase
+        self.byteCount = (len(self.keywords) + 7) // 8
+
+        patterns = [self.normalize(keyword) for keyword in self.keywords if keyword != '']
+        # Zero width lookahead, so matches that overlap are all found
+        self.regex = re.compile('(?=(' + trieRegex(patterns) + '))', re.IGNORECASE if ignoreCase else 0)
+
+        # Only the longest keyword at a position is reported, so a match implies every keyword inside it
+        self.matchMasks = {}
+        for pattern in set(patterns):
+            mask = 0
+            for i, keyword in enumerate(self.keywords):
+                if keyword != '' and self.normalize(keyword) in pattern:
+                    mask |= 1 << i
+            self.matchMasks[pattern] = mask
+        # Like `str.contains('')`, an empty keyword occurs in every text
+        self.emptyMask = sum(1 << i for i, keyword in enumerate(self.keywords) if keyword == '')
+
+    def normalize(self, text):
+        return text.lower() if self.ignoreCase else text
+
+    def matchText(self, text):
+        """
+        Returns an int with bit i set when keyword i occurs in the text.
+        """
+        mask = self.emptyMask
+        if len(self.matchMasks) == 0:
+            return mask
+        for match in self.regex.finditer(text):
+            mask |= self.matchMasks.get(self.normalize(match.group(1)), 0)
+        return mask
+
+    def matchSeries(self, series):
+        """
+        Returns the bitsets (one row of bytes per text) of the keywords in every text of a series. Every distinct
+        text is only scanned once, for a categorical series (like the text columns of the store) the distinct texts are
+        its categories. Missing texts match nothing.
+        """
+        codes, texts = pd.factorize(series)
+        masks = b''.join(
+            [self.matchText(str(text)).to_bytes(self.byteCount, 'little') for text in texts] + [bytes(self.byteCount)])
+        bitsets = np.frombuffer(masks, dtype=np.uint8).reshape(len(texts) + 1, self.byteCount)
+        # Missing texts have code -1, they take the empty bitset at the end
+        return bitsets[codes]
+
+    def matchAds(self, df, columns=TEXT_COLUMNS):
+        """
+        Returns the bitsets of the keywords that occur in any of the text columns of the ads. Every distinct text of a
+        column is matched once (see `matchSeries`).
+        """
+        bitsets = np.zeros((len(df), self.byteCount), dtype=np.uint8)
+        for column in columns:
+            bitsets |= self.matchSeries(df[column])
+        return bitsets
+
+
+# Returns the keyword bitsets of every ad of a party. 'substring' scans the text columns with a KeywordMatcher, like
+# `str.contains` on every column. 'word' looks the keywords up as whole words in the keyword index, which always
+# ignores case
+def matchPartyAds(party, keywords, matchMode='substring', ignoreCase=False, storeDir=STORE_DIR):
+    if matchMode == 'substring':
+        # The texts are scanned a chunk of ads at a time
+        matcher = KeywordMatcher(keywords, ignoreCase)
+        bitsets = [matcher.matchAds(df) for df in iterAds(party, TEXT_COLUMNS, storeDir=storeDir)]
+        return np.concatenate(bitsets) if bitsets else np.zeros((0, matcher.byteCount), dtype=np.uint8)
+    return loadKeywordIndex(party, storeDir).matchBitsets(keywords)
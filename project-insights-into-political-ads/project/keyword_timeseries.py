@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from ad_store import loadAds, PARTY_DIRS, STORE_DIR
+from keyword_matcher import matchPartyAds, unpackMatches
+
+# Amount of ads of which the keyword bitsets are unpacked at once
+CHUNK_SIZE = 100000
+
+
+# Returns the dates as whole days since origin, -1 for missing dates
+def dayIndex(dates, origin):
+    days = pd.Series(dates).to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    missing = np.isnat(days)
+    days = (days - np.datetime64(origin, 'D')).astype(np.int64)
+    days[missing] = -1
+    return days
+
+
+# Returns counts[day, keyword] of the ads that match a keyword, counted on the day of the ad. Ads with day -1 are not
+# counted. All keywords are counted in one bincount
+def dailyKeywordCounts(bitsets, keywordCount, days, dayCount):
+    counts = np.zeros(dayCount * keywordCount, dtype=np.int64)
+    for start in range(0, len(days), CHUNK_SIZE):
+        rows, keywords = np.nonzero(unpackMatches(bitsets[start:start + CHUNK_SIZE], keywordCount))
+        rowDays = days[start:start + CHUNK_SIZE][rows]
+        counted = rowDays >= 0
+        counts += np.bincount(rowDays[counted] * keywordCount + keywords[counted], minlength=len(counts))
+    return counts.reshape(dayCount, keywordCount)
+
+
+class KeywordTimeSeries:
+    """
+    Daily counts of the ads of every party that match each keyword, by ad_delivery_start_time, in counts[day, keyword,
+    party]. The days run from the first to the last day on which an ad matched one of the keywords.
+    """
+    def __init__(self, keywords, matchMode='substring', ignoreCase=False, parties=None, storeDir=STORE_DIR):
+        self.keywords = list(keywords)
+        self.parties = list(PARTY_DIRS) if parties is None else list(parties)
+
+        dates = {}
+        bitsets = {}
+        for party in self.parties:
+            dates[party] = loadAds(party, ['ad_delivery_start_time'], storeDir)['ad_delivery_start_time']
+            bitsets[party] = matchPartyAds(party, self.keywords, matchMode, ignoreCase, storeDir)
+
+        # Amount of ads per party and of matching ads per keyword and party, also those without a date
+        self.adCounts = np.array([len(dates[party]) for party in self.parties])
+        self.matchCounts = np.array([unpackMatches(bitsets[party], len(self.keywords)).sum(axis=0)
+                                     for party in self.parties]).reshape(len(self.parties), len(self.keywords)).T
+
+        allDates = pd.concat(list(dates.values()))
+        if allDates.notna().any():
+            origin = allDates.min().normalize()
+            dayCount = int((allDates.max() - origin).days) + 1
+        else:
+            origin = pd.Timestamp(0)
+            dayCount = 0
+        counts = np.stack([dailyKeywordCounts(bitsets[party], len(self.keywords), dayIndex(dates[party], origin),
+                                              dayCount) for party in self.parties], axis=2)
+
+        # Only keep the days between the first and last match
+        matchedDays = np.flatnonzero(counts.sum(axis=(1, 2)))
+        if len(matchedDays) == 0:
+            matchedDays = np.array([0, -1])
+        self.counts = counts[matchedDays[0]:matchedDays[-1] + 1]
+        self.dates = pd.date_range(origin + pd.Timedelta(days=int(matchedDays[0])), periods=len(self.counts), freq='1D')
+
+    def keywordsFound(self):
+        return [keyword for keyword, count in zip(self.keywords, self.matchCounts.sum(axis=1)) if count > 0]
+
+    def keywordFrame(self):
+        """
+        Returns dataframe with a row per day and a column per keyword that was found, with all parties summed.
+        """
+        df = pd.DataFrame(self.counts.sum(axis=2), columns=self.keywords)[self.keywordsFound()]
+        df.insert(0, 'ad_delivery_start_time', self.dates)
+        return df
+
+    def partyFrame(self, keyword):
+        """
+        Returns dataframe with a row per day and a column per party (capitalized) for one keyword.
+        """
+        df = pd.DataFrame(self.counts[:, self.keywords.index(keyword), :],
+                          columns=[party.capitalize() for party in self.parties])
+        df.insert(0, 'ad_delivery_start_time', self.dates)
+        return df
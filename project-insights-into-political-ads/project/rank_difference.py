@@ -1,5 +1,6 @@
 #!/usr/bin/python
 import sys, getopt
+import heapq
 
 class RankDifference:
     """
@@ -25,52 +26,62 @@ class RankDifference:
         """
         Read in both lists of ranked terms from the given input files.
         """
-        # read fileA
-        self.listA = [line.split(' --- ')[0].rstrip('\n') for line in open(self.fileA, encoding='utf-8')]
-        self.listAFrequencies = [line.split(' --- ')[1].rstrip('\n') for line in open(self.fileA, encoding='utf-8')]
+        self.listA, self.listAFrequencies = self.readList(self.fileA)
+        self.listB, self.listBFrequencies = self.readList(self.fileB)
 
-        # read fileB
-        self.listB = [line.split(' --- ')[0].rstrip('\n') for line in open(self.fileB, encoding='utf-8')]
-        self.listBFrequencies = [line.split(' --- ')[1].rstrip('\n') for line in open(self.fileB, encoding='utf-8')]
+    def readList(self, file):
+        """
+        Read the terms and frequencies of one file of 'term --- frequency' lines, in a single pass.
+        """
+        terms = list()
+        frequencies = list()
+        for line in open(file, encoding='utf-8'):
+            parts = line.split(' --- ')
+            terms.append(parts[0].rstrip('\n'))
+            frequencies.append(parts[1].rstrip('\n'))
+        return terms, frequencies
+
+    def rankLookup(self, terms):
+        """
+        Map every term to the position of its first occurrence, like list.index() gives.
+        """
+        ranks = dict()
+        for rank, term in enumerate(terms):
+            ranks.setdefault(term, rank)
+        return ranks
 
     def computeRankDifference(self):
         sizeA = len(self.listA)
         sizeB = len(self.listB)
+        sizeAFrequencies = len(self.listAFrequencies)
+        sizeBFrequencies = len(self.listBFrequencies)
+        ranksA = self.rankLookup(self.listA)
+        ranksB = self.rankLookup(self.listB)
         # list of all terms
         dictionary = list(set(self.listA) | set(self.listB))
         differences = list()
         for term in dictionary:
-            try:
-                rankA = self.listA.index(term) + 1
-            except ValueError:
-                rankA = sizeA # sizeA + 1 instead?
-            try:
-                rankB = self.listB.index(term)
-            except ValueError:
-                rankB = sizeB
-            try:
-                freqA = self.listAFrequencies[rankA]
-            except IndexError:
-                freqA = 0
-            try:
-                freqB = self.listBFrequencies[rankB]
-            except IndexError:
-                freqB = 0
+            # rankA counts from 1 and rankB from 0, and the frequencies are looked up with these ranks, as before
+            rankA = ranksA[term] + 1 if term in ranksA else sizeA # sizeA + 1 instead?
+            rankB = ranksB.get(term, sizeB)
+            freqA = self.listAFrequencies[rankA] if rankA < sizeAFrequencies else 0
+            freqB = self.listBFrequencies[rankB] if rankB < sizeBFrequencies else 0
             rankDiff = 1.0*rankA/sizeA - 1.0*rankB/sizeB # in [-1,1]
             differences.append((term, rankDiff, freqA, freqB))
-        if not listOnly:
+        # only the top `limit` terms are needed, heapq selects them without sorting all differences
+        if not self.listOnly:
             print("\nDescriptive terms for {}:".format(self.fileA))
             if self.reverse:
-                print(sorted(differences, key=lambda i: i[1] if i[1] <= 0 else -1, reverse=True)[0:self.limit])
+                print(heapq.nlargest(self.limit, differences, key=lambda i: i[1] if i[1] <= 0 else -1))
             else:
-                print(sorted(differences, key=lambda i: i[1])[0:self.limit])
+                print(heapq.nsmallest(self.limit, differences, key=lambda i: i[1]))
             print("\nDescriptive terms for {}:".format(self.fileB))
             if self.reverse:
-                print(sorted(differences, key=lambda i: i[1] if i[1] >= 0 else 1)[0:self.limit])
+                print(heapq.nsmallest(self.limit, differences, key=lambda i: i[1] if i[1] >= 0 else 1))
             else:
-                print(sorted(differences, key=lambda i: i[1], reverse=True)[0:self.limit])
+                print(heapq.nlargest(self.limit, differences, key=lambda i: i[1]))
         else:
-            for item in sorted(differences, key=lambda i: i[1])[0:self.limit]:
+            for item in heapq.nsmallest(self.limit, differences, key=lambda i: i[1]):
                 print(item[0])
 
 if __name__ == "__main__":
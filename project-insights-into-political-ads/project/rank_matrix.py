@@ -0,0 +1,167 @@
+#!/usr/bin/python
+import sys, getopt
+import numpy as np
+import pandas as pd
+from os import makedirs
+from os.path import basename, join, splitext
+from term_counts import rankCounts
+
+# Amount of pairs of which the differences are computed at once
+PAIR_CHUNK = 64
+
+
+# Returns the terms and counts of a file of 'term --- count' lines (see `rank_file_maker.py`), in rank order. Files
+# with only a term per line give count 0
+def readCounts(file):
+    terms = list()
+    counts = list()
+    for line in open(file, encoding='utf-8'):
+        parts = line.rstrip('\n').split(' --- ')
+        terms.append(parts[0])
+        counts.append(int(parts[1]) if len(parts) > 1 else 0)
+    return pd.Series(counts, index=terms, dtype=np.int64)
+
+
+# Name of a source read from a file: the file name without extension and without '-3-counts'
+def sourceName(file):
+    name = splitext(basename(file))[0]
+    return name[:-len('-3-counts')] if name.endswith('-3-counts') else name
+
+
+class RankMatrix:
+    """
+    Ranks of all terms of a number of sources (a party, a year, a page, ...) aligned in one term x source matrix. The
+    rank of a term is its position in the ranked list of the source, starting at 0. Terms that are not in a source get
+    the size of the source as rank. The rank difference of a term between two sources is rankA/sizeA - rankB/sizeB, in
+    [-1, 1], so the most negative differences are the most descriptive terms of source A.
+    """
+    def __init__(self, sources):
+        # sources: name -> series of count by term, in rank order
+        self.sources = list(sources)
+        ranked = [series[~series.index.duplicated()] for series in sources.values()]
+        self.terms = pd.Index(sorted(set().union(*[series.index for series in ranked])))
+        self.sizes = np.array([len(series) for series in ranked], dtype=np.int64)
+
+        self.ranks = np.empty((len(self.terms), len(self.sources)), dtype=np.int32)
+        self.counts = np.zeros((len(self.terms), len(self.sources)), dtype=np.int64)
+        for i, series in enumerate(ranked):
+            positions = pd.Index(series.index).get_indexer(self.terms)
+            present = positions >= 0
+            self.ranks[:, i] = np.where(present, positions, self.sizes[i])
+            self.counts[present, i] = series.to_numpy()[positions[present]]
+
+    @classmethod
+    def fromFiles(cls, files):
+        """
+        Builds the matrix from count files, by file name (see `sourceName`) or from a dict of name -> file.
+        """
+        if not isinstance(files, dict):
+            files = {sourceName(file): file for file in files}
+        return cls({name: readCounts(file) for name, file in files.items()})
+
+    @classmethod
+    def fromCounts(cls, counts, minCount=3, stopwords=()):
+        """
+        Builds the matrix from a dict of name -> Counter of terms (see `term_counts.py`), ranked like the count files.
+        """
+        sources = {}
+        for name, sourceCounts in counts.items():
+            ranked = rankCounts(sourceCounts, minCount, stopwords)
+            sources[name] = pd.Series([count for term, count in ranked], index=[term for term, count in ranked],
+                                      dtype=np.int64)
+        return cls(sources)
+
+    def index(self, source):
+        return self.sources.index(source)
+
+    def normalizedRanks(self):
+        return self.ranks / self.sizes.clip(min=1)
+
+    def differences(self, pairs):
+        """
+        Returns the rank differences of every term for every (sourceA, sourceB) pair, in a term x pair matrix.
+        """
+        left = [self.index(a) for a, b in pairs]
+        right = [self.index(b) for a, b in pairs]
+        normalized = self.normalizedRanks()
+        return normalized[:, left] - normalized[:, right]
+
+    def allPairs(self):
+        return [(a, b) for a in self.sources for b in self.sources if a != b]
+
+    def baselinePairs(self, baseline):
+        return [(source, baseline) for source in self.sources if source != baseline]
+
+    def pairFrames(self, pairs, limit=None):
+        """
+        Yields a dataframe per pair with the terms of either source, the rank difference and the frequency in both
+        sources, most descriptive terms of sourceA first. With a limit only the first `limit` terms are kept.
+        """
+        for start in range(0, len(pairs), PAIR_CHUNK):
+            chunk = pairs[start:start + PAIR_CHUNK]
+            differences = self.differences(chunk)
+            for i, (a, b) in enumerate(chunk):
+                countsA = self.counts[:, self.index(a)]
+                countsB = self.counts[:, self.index(b)]
+                # Only the terms of the pair, a term that is in neither source would get difference 0
+                rows = np.flatnonzero((self.ranks[:, self.index(a)] < self.sizes[self.index(a)]) |
+                                      (self.ranks[:, self.index(b)] < self.sizes[self.index(b)]))
+                rows = rows[np.argsort(differences[rows, i], kind='stable')][:limit]
+                yield a, b, pd.DataFrame({
+                    'term': self.terms[rows],
+                    'rank difference': differences[rows, i],
+                    'frequency ' + a: countsA[rows],
+                    'frequency ' + b: countsB[rows],
+                })
+
+    def writePairs(self, pairs, outDir='.', fileFormat='csv', limit=None):
+        """
+        Writes the frame of every pair (see `pairFrames`) to '<outDir>/<a>-<b>-rank-difference-with-amounts.<csv or
+        parquet>'. Returns the written files.
+        """
+        makedirs(outDir, exist_ok=True)
+        files = []
+        for a, b, df in self.pairFrames(pairs, limit):
+            file = join(outDir, '{}-{}-rank-difference-with-amounts.{}'.format(a, b, fileFormat))
+            if fileFormat == 'parquet':
+                df.to_parquet(file, index=False)
+            else:
+                df.to_csv(file, index=False)
+            files.append(file)
+        return files
+
+
+if __name__ == "__main__":
+    # parse cmdline arguments
+    baseline = ''
+    outDir = '.'
+    fileFormat = 'csv'
+    numTerms = None
+    errorMsg = 'rank_matrix.py [-b <baselineFile>] [-o <outDir>] [-f csv|parquet] [-n <numTerms>] <countFile>...'
+    try:
+        opts, files = getopt.getopt(sys.argv[1:], "hb:o:f:n:", ["baseline=", "outDir=", "format=", "numTerms="])
+    except getopt.GetoptError:
+        print(errorMsg)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(errorMsg)
+            sys.exit()
+        elif opt in ("-b", "--baseline"): # compare every file with the baseline only, instead of every pair of files
+            baseline = arg
+        elif opt in ("-o", "--outDir"):
+            outDir = arg
+        elif opt in ("-f", "--format"):
+            fileFormat = arg
+        elif opt in ("-n", "--numTerms"):
+            numTerms = int(arg)
+
+    if len(files) + (baseline != '') < 2 or fileFormat not in ('csv', 'parquet'):
+        print(errorMsg)
+        sys.exit()
+
+    matrix = RankMatrix.fromFiles(files + ([baseline] if baseline != '' else []))
+    pairs = matrix.baselinePairs(sourceName(baseline)) if baseline != '' else matrix.allPairs()
+    for file in matrix.writePairs(pairs, outDir, fileFormat, numTerms):
+        print(file)
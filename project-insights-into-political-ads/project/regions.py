@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from ad_store import STORE_DIR
+from ad_cube import loadCube
+
+COORDINATES_FILE = './coordinates.csv'
+
+
+# Returns the region dimension: a row per region name (the regions of the data and of the coordinates file, sorted)
+# with its latitude and longitude, NaN for regions without coordinates. The code of a region is its position
+def regionTable(regions, coordinatesFile=COORDINATES_FILE):
+    coordinates = pd.read_csv(coordinatesFile).rename(columns={'state': 'region'})
+    names = sorted(set(regions) | set(coordinates['region']))
+    return pd.DataFrame({'region': names}).merge(coordinates, on='region', how='left')
+
+
+class RegionSums:
+    """
+    Sums of measures of the region cube (see `ad_cube.py`) per party and region code, in values[measure][party, code].
+    The sums of all parties are computed in one bincount over the rows of the cube.
+    """
+    def __init__(self, measures, parties=None, storeDir=STORE_DIR, coordinatesFile=COORDINATES_FILE):
+        cube = loadCube('region', parties, storeDir)
+        self.parties = list(cube['party'].cat.categories)
+        self.regions = regionTable(cube['region'].cat.categories, coordinatesFile)
+
+        # Codes of the cube regions in the region dimension, -1 for entries without region
+        codes = pd.Index(self.regions['region']).get_indexer(cube['region'].cat.categories)
+        codes = np.append(codes, -1)[cube['region'].cat.codes.to_numpy()]
+        rows = codes >= 0
+        keys = cube['party'].cat.codes.to_numpy()[rows] * len(self.regions) + codes[rows]
+        size = len(self.parties) * len(self.regions)
+        self.values = {measure: np.bincount(keys, cube[measure].to_numpy()[rows], minlength=size).reshape(
+            len(self.parties), len(self.regions)) for measure in measures}
+
+    def matched(self):
+        return self.regions['lat'].notna().to_numpy() & self.regions['lon'].notna().to_numpy()
+
+    def partyFrame(self, party, measures=None):
+        """
+        Returns dataframe with the regions, their coordinates and the sums of the measures of a party.
+        """
+        df = self.regions.copy()
+        for measure in self.values if measures is None else measures:
+            df[measure] = self.values[measure][self.parties.index(party)]
+        return df
+
+    def unmatched(self, measure):
+        """
+        Returns dataframe of the regions with a sum of the measure in some party but no coordinates, with those sums.
+        """
+        found = (self.values[measure] != 0).any(axis=0) & ~self.matched()
+        df = self.regions[found][['region']].reset_index(drop=True)
+        for i, party in enumerate(self.parties):
+            df[party] = self.values[measure][i][found]
+        return df
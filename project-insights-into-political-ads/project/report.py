@@ -0,0 +1,152 @@
+import getopt
+import sys
+from html import escape
+from os import makedirs
+from os.path import basename, join
+from ad_store import STORE_DIR
+from ad_cube import loadCube
+from charts import barchartFigures, demographicMetricFigures, demographicSimpleFigures, geomapFigures, \
+    geomapMeasure, geomapMeasures, spendPerYearFigures
+from regions import RegionSums
+
+# Figure function of every chart (see `charts.py`) and the shared data it is given, in order
+CHARTS = {
+    'barchart': (barchartFigures, ['adsCube', 'rangesCube']),
+    'demographic-simple': (demographicSimpleFigures, ['adsCube', 'demographicCube']),
+    'demographic-metric': (demographicMetricFigures, ['adsCube', 'demographicCube']),
+    'geomap': (geomapFigures, ['adsCube', 'regionSums']),
+    'spend-per-year': (spendPerYearFigures, ['adsCube']),
+}
+METRIC_COLUMNS = ['impressions', 'spend', 'estimated_audience_size']
+SIMPLE_COLUMNS = ['currency', 'publisher_platforms', 'languages']
+GROUP_BY_COLUMNS = ['age', 'gender']
+# The charts of the full report: every chart and the arguments of its figure function. The bar charts of the metric
+# columns count the ads per range in the 'ranges' cube, like `barchart-simple-columns.py`
+REPORT = [{'chart': 'barchart', 'column': column} for column in METRIC_COLUMNS + SIMPLE_COLUMNS] + \
+         [{'chart': 'demographic-simple', 'metricColumn': metricColumn, 'groupByColumn': groupByColumn}
+          for metricColumn in SIMPLE_COLUMNS for groupByColumn in GROUP_BY_COLUMNS] + \
+         [{'chart': 'demographic-metric', 'metricColumn': metricColumn, 'groupByColumn': groupByColumn}
+          for metricColumn in METRIC_COLUMNS for groupByColumn in GROUP_BY_COLUMNS] + \
+         [{'chart': 'geomap', 'metricColumn': metricColumn} for metricColumn in METRIC_COLUMNS] + \
+         [{'chart': 'spend-per-year', 'metricColumn': 'spend'}]
+FILE_FORMATS = ['html', 'png', 'svg', 'pdf']
+
+
+# Name of the files of a chart: the chart and the values of its arguments
+def chartName(spec):
+    return '-'.join([spec['chart']] + [str(value) for key, value in spec.items() if key != 'chart'])
+
+
+class ReportData:
+    """
+    The data that the charts of a report share: the 'ads', 'ranges' and 'demographic' cubes and the region sums of the
+    measures of all geomaps. Each is loaded once, when the first chart that needs it asks for it.
+    """
+    def __init__(self, specs, storeDir=STORE_DIR, workers=1):
+        self.storeDir = storeDir
+        self.workers = workers
+        self.regionMeasures = sorted({measure for spec in specs if spec['chart'] == 'geomap'
+                                      for measure in geomapMeasures(spec.get('metricColumn', 'spend'))})
+        self.data = {}
+
+    def get(self, name):
+        if name not in self.data:
+            if name == 'adsCube':
+                self.data[name] = loadCube('ads', storeDir=self.storeDir, workers=self.workers)
+            elif name == 'rangesCube':
+                self.data[name] = loadCube('ranges', storeDir=self.storeDir, workers=self.workers)
+            elif name == 'demographicCube':
+                self.data[name] = loadCube('demographic', storeDir=self.storeDir, workers=self.workers)
+            elif name == 'regionSums':
+                # Builds missing region cubes with the workers, `RegionSums` then reads them from the store
+                loadCube('region', storeDir=self.storeDir, workers=self.workers)
+                self.data[name] = RegionSums(self.regionMeasures, storeDir=self.storeDir)
+        return self.data[name]
+
+
+def writeFigure(fig, file, fileFormat):
+    if fileFormat == 'html':
+        fig.write_html(file, include_plotlyjs='cdn')
+    else:
+        # Static images need the kaleido package
+        fig.write_image(file, format=fileFormat)
+
+
+# Writes an index page that shows every file of the report
+def writeIndex(files, outDir, fileFormat):
+    lines = ['<html><head><meta charset="utf-8"><title>Report</title></head><body>']
+    for file in files:
+        name = escape(basename(file))
+        if fileFormat == 'html':
+            lines.append('<iframe src="{}" width="100%" height="800" frameborder="0"></iframe>'.format(name))
+        else:
+            lines.append('<p>{}</p><img src="{}" style="max-width: 100%">'.format(name, name))
+    lines.append('</body></html>')
+    file = join(outDir, 'index.html')
+    with open(file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    return file
+
+
+# Renders the figures of all chart specs (the full report by default) into files in outDir, without showing them.
+# The cubes are loaded once and every chart only sums them. Returns the written files
+def renderReport(specs=REPORT, outDir='report', fileFormat='html', storeDir=STORE_DIR, workers=1):
+    if fileFormat not in FILE_FORMATS:
+        raise ValueError('Unknown file format ' + fileFormat + ', expected one of ' + ', '.join(FILE_FORMATS))
+    makedirs(outDir, exist_ok=True)
+    data = ReportData(specs, storeDir, workers)
+    files = []
+    for spec in specs:
+        function, inputs = CHARTS[spec['chart']]
+        arguments = {key: value for key, value in spec.items() if key != 'chart'}
+        figures = function(*[data.get(name) for name in inputs], **arguments)
+        for i, fig in enumerate(figures):
+            name = chartName(spec) + ('-' + str(i + 1) if len(figures) > 1 else '')
+            file = join(outDir, name + '.' + fileFormat)
+            writeFigure(fig, file, fileFormat)
+            files.append(file)
+
+    # Regions that can not be shown on the maps
+    if 'regionSums' in data.data:
+        for spec in specs:
+            if spec['chart'] != 'geomap':
+                continue
+            unmatched = data.get('regionSums').unmatched(geomapMeasure(spec.get('metricColumn', 'spend')))
+            if len(unmatched) > 0:
+                file = join(outDir, chartName(spec) + '-regions-without-coordinates.csv')
+                unmatched.to_csv(file, index=False)
+                files.append(file)
+
+    files.append(writeIndex([file for file in files if file.endswith('.' + fileFormat)], outDir, fileFormat))
+    return files
+
+
+if __name__ == "__main__":
+    # parse cmdline arguments
+    outDir = 'report'
+    fileFormat = 'html'
+    workers = None
+    errorMsg = 'report.py [-o <outDir>] [-f ' + '|'.join(FILE_FORMATS) + '] [-w <workers>]'
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ho:f:w:", ["outDir=", "format=", "workers="])
+    except getopt.GetoptError:
+        print(errorMsg)
+        sys.exit(2)
+
+    for opt, arg in opts:
+        if opt == '-h':
+            print(errorMsg)
+            sys.exit()
+        elif opt in ("-o", "--outDir"):
+            outDir = arg
+        elif opt in ("-f", "--format"):
+            fileFormat = arg
+        elif opt in ("-w", "--workers"): # processes used to build missing cubes, one per CPU core by default
+            workers = int(arg)
+
+    if fileFormat not in FILE_FORMATS:
+        print(errorMsg)
+        sys.exit()
+
+    for file in renderReport(outDir=outDir, fileFormat=fileFormat, workers=workers):
+        print(file)
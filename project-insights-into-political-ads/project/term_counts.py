@@ -0,0 +1,136 @@
+import json
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import Counter
+from os.path import basename, dirname, isfile, join, splitext
+from ad_store import iterPage, mapFiles, pageFiles, pageHashes, partialDir, partialFile, removeStalePartials, \
+    uniqueRows, STORE_DIR
+
+# Text columns that are counted, joined with a space like `rank_file_maker.py` always did
+COUNT_COLUMNS = ['ad_creative_bodies', 'ad_creative_link_titles', 'ad_creative_link_descriptions']
+# Amount of ads that are split into words at once
+CHUNK_SIZE = 50000
+
+
+# Returns the words of a series of texts: split on spaces, lower case and without punctuation. Missing texts count as
+# 'nan'
+def splitWords(texts):
+    words = texts.astype(str).str.replace('\n', ' ', regex=False).str.split(' ').explode()
+    words = words.str.lower().str.replace(r'[^\w\s]', '', regex=True)
+    return words[words != '']
+
+
+# Counts the words of a dataframe of ads, as if the COUNT_COLUMNS of every ad were joined with a space. Every distinct
+# text of a column is split once, `CHUNK_SIZE` texts at a time, and its words are counted once per ad with the text
+def countTerms(df):
+    counts = Counter()
+    for column in COUNT_COLUMNS:
+        texts, _, textCounts = uniqueRows(df, [column])
+        texts = texts[column].reset_index(drop=True)
+        for start in range(0, len(texts), CHUNK_SIZE):
+            words = splitWords(texts.iloc[start:start + CHUNK_SIZE])
+            weights = pd.Series(textCounts[words.index], index=words.to_numpy())
+            counts.update(weights.groupby(level=0).sum().to_dict())
+    return counts
+
+
+# Counts the words of a page file, reading one chunk of ads at a time
+def countPageTerms(file):
+    counts = Counter()
+    for df in iterPage(file, COUNT_COLUMNS):
+        counts.update(countTerms(df))
+    return counts
+
+
+# Writes counts as a parquet file of terms and counts, with the hashes of the counted pages in the metadata
+def writeCounter(counts, file, pageHashes=()):
+    table = pa.table({
+        'term': pa.array(list(counts), pa.string()),
+        'count': pa.array(list(counts.values()), pa.int64()),
+    })
+    table = table.replace_schema_metadata({'pages': json.dumps(sorted(pageHashes))})
+    pq.write_table(table, file + '.tmp')
+    os.replace(file + '.tmp', file)
+
+
+# Returns the counts and the counted page hashes of a file written by `writeCounter`
+def readCounter(file):
+    table = pq.read_table(file)
+    counts = Counter(dict(zip(table.column('term').to_pylist(), table.column('count').to_pylist())))
+    return counts, Counter(json.loads(table.schema.metadata[b'pages']))
+
+
+def countPagePartial(file, partial):
+    writeCounter(countPageTerms(file), partial)
+
+
+# Counts the pages of a party that have no counts in the store yet, every page by a worker. Returns the page files and
+# their hashes
+def countPagePartials(party, workers=None, storeDir=STORE_DIR):
+    files = pageFiles(party, storeDir)
+    hashes = pageHashes(party, storeDir)
+    os.makedirs(partialDir(party, 'terms', storeDir), exist_ok=True)
+    missing = {pageHash: file for file, pageHash in zip(files, hashes)
+               if not isfile(partialFile(party, 'terms', pageHash, storeDir))}
+    mapFiles(countPagePartial, list(missing.values()),
+             [partialFile(party, 'terms', pageHash, storeDir) for pageHash in missing], workers=workers)
+    return files, hashes
+
+
+def totalFile(party, storeDir=STORE_DIR):
+    return join(dirname(partialDir(party, 'terms', storeDir)), 'term-counts.parquet')
+
+
+# Counts the words of all ads of a party. The counts of every page are kept in the store, only new or changed pages are
+# counted, each by a worker. The total of the last run is updated by subtracting the counts of the pages that changed
+# or are gone and adding those of the new pages, so memory depends on the amount of distinct words instead of the
+# amount of ads and the time on the amount of changed pages
+def countPartyTerms(party, workers=None, storeDir=STORE_DIR):
+    files, hashes = countPagePartials(party, workers, storeDir)
+    pages = Counter(hashes)
+    counts, counted = Counter(), Counter()
+    if isfile(totalFile(party, storeDir)):
+        counts, counted = readCounter(totalFile(party, storeDir))
+    if any(not isfile(partialFile(party, 'terms', pageHash, storeDir)) for pageHash in counted - pages):
+        # The counts of a page that is gone are missing, count from scratch
+        counts, counted = Counter(), Counter()
+
+    for pageHash, times in (counted - pages).items():
+        pageCounts = readCounter(partialFile(party, 'terms', pageHash, storeDir))[0]
+        for _ in range(times):
+            counts.subtract(pageCounts)
+    for pageHash, times in (pages - counted).items():
+        pageCounts = readCounter(partialFile(party, 'terms', pageHash, storeDir))[0]
+        for _ in range(times):
+            counts.update(pageCounts)
+    # Terms of which all ads are gone
+    counts = +counts
+
+    writeCounter(counts, totalFile(party, storeDir), pages.elements())
+    removeStalePartials(party, 'terms', hashes, storeDir)
+    return counts
+
+
+# Counts the words of every page of a party separately, by page name (the file name without extension)
+def countPagesTerms(party, workers=None, storeDir=STORE_DIR):
+    files, hashes = countPagePartials(party, workers, storeDir)
+    return {splitext(basename(file))[0]: readCounter(partialFile(party, 'terms', pageHash, storeDir))[0]
+            for file, pageHash in zip(files, hashes)}
+
+
+# Returns the (term, count) pairs with a count of at least minCount that are not stopwords, most frequent first
+def rankCounts(counts, minCount=3, stopwords=()):
+    return sorted([(term, count) for term, count in counts.items() if count >= minCount and term.lower() not in
+                   stopwords], key=lambda item: (-item[1], item[0]))
+
+
+# Writes the ranked terms (see `rankCounts`) as 'term --- count' lines. The file is replaced at once, so a run that
+# fails halfway leaves the old file
+def writeCounts(counts, file, minCount=3, stopwords=()):
+    tmpFile = file + '.tmp'
+    with open(tmpFile, 'w', encoding='utf-8') as f:
+        for term, count in rankCounts(counts, minCount, stopwords):
+            f.write(term + ' --- ' + str(count) + '\n')
+    os.replace(tmpFile, file)
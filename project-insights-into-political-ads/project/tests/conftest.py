@@ -0,0 +1,93 @@
+import csv
+import json
+import sys
+import numpy as np
+import pytest
+from os import makedirs
+from os.path import dirname, join, realpath
+
+# The scripts import each other as top level modules from the project directory
+sys.path.insert(0, dirname(dirname(realpath(__file__))))
+
+import ad_store
+from ad_store import ALL_COLUMNS
+
+WORDS = "Trump Biden Biden's vote voters donate election president chip in now help us today fight win I'm".split()
+AGES = ['18-24', '25-34', '35-44', '65+']
+REGIONS = ['California', 'Texas', 'New York', 'Narnia']
+
+
+def rangeText(rng, step):
+    value = int(rng.integers(0, 20)) * step
+    kind = rng.random()
+    if kind < 0.1:
+        return ''
+    if kind < 0.2:
+        return 'lower_bound: ' + format(value * 10, ',')
+    return 'lower_bound: ' + format(value, ',') + ', upper_bound: ' + format(value + step - 1, ',')
+
+
+def creativeText(rng):
+    if rng.random() < 0.15:
+        return ''
+    return ' '.join(rng.choice(WORDS, int(rng.integers(1, 8))))
+
+
+def distributionText(rng, entries):
+    if rng.random() < 0.1:
+        return ''
+    return ', '.join(json.dumps(dict(entry, percentage=round(float(rng.random()) / len(entries), 4)))
+                     for entry in entries)
+
+
+# Writes a page csv with the columns of the Ad Library, with ads of random values and texts that repeat. With times
+# the start times have a time of day
+def writePage(file, pageId, ads, seed, times=False):
+    rng = np.random.default_rng(seed)
+    with open(file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ALL_COLUMNS)
+        for i in range(ads):
+            start = '2020-{:02d}-{:02d}'.format(int(rng.integers(1, 13)), int(rng.integers(1, 29)))
+            if times:
+                start += ' {:02d}:{:02d}:00'.format(int(rng.integers(0, 24)), int(rng.integers(0, 60)))
+            demographic = [{'age': age, 'gender': gender} for age in rng.choice(AGES, 2, replace=False)
+                           for gender in ['female', 'male']]
+            region = [{'region': region} for region in rng.choice(REGIONS, 2, replace=False)]
+            writer.writerow([pageId * 10000 + i, pageId, 'Page ' + str(pageId), start, start, '', 'Page',
+                             creativeText(rng), creativeText(rng), creativeText(rng), creativeText(rng),
+                             rangeText(rng, 1000), rangeText(rng, 100), rng.choice(['USD', 'USD', 'EUR', '']),
+                             distributionText(rng, demographic), distributionText(rng, region),
+                             rng.choice(["['facebook']", "['facebook', 'instagram']", '']), rangeText(rng, 10000),
+                             rng.choice(["['en']", "['es']", "['en', 'es']", ''])])
+
+
+# Page csv files of both parties in a temporary directory, used as PARTY_DIRS. Parametrize `times` to give the start
+# times a time of day
+@pytest.fixture
+def times():
+    return False
+
+
+@pytest.fixture
+def adsDirs(tmp_path, monkeypatch, times):
+    dirs = {}
+    for p, party in enumerate(['democrats', 'republicans']):
+        directory = join(str(tmp_path), 'ads', party)
+        makedirs(directory)
+        for page in range(3):
+            writePage(join(directory, 'Page,{}.csv'.format(page)), p * 10 + page + 1, 150 + 50 * page, p * 10 + page,
+                      times)
+        dirs[party] = directory
+        monkeypatch.setitem(ad_store.PARTY_DIRS, party, directory)
+    return dirs
+
+
+# Store of the page csv files of `adsDirs`, ingested a few ads at a time so the chunked reads have several chunks
+@pytest.fixture
+def storeDir(tmp_path, adsDirs, monkeypatch):
+    monkeypatch.setattr(ad_store, 'CHUNK_ROWS', 64)
+    directory = join(str(tmp_path), 'store')
+    for party in adsDirs:
+        ad_store.ingestParty(party, storeDir=directory, workers=1)
+    return directory
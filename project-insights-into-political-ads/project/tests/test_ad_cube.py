@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ad_cube import adsColumn, hasColumn, loadCube, rollUp
+from ad_store import loadAds, midColumn, RANGE_COLUMNS
+from charts import barchartFigures
+from distributions import explodeDistribution, loadDistribution, DISTRIBUTION_KEYS
+
+PARTIES = ['democrats', 'republicans']
+
+
+# Sorts the rows of a dataframe by its columns and drops the index, so groupings in another order compare equal
+def sortedFrame(df):
+    df = df.astype({column: 'object' for column in df.columns if df[column].dtype.name == 'category'})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('column', ['currency', 'publisher_platforms', 'languages'] + RANGE_COLUMNS)
+def testCubeCountsLikeGroupBy(storeDir, column):
+    cube = loadCube('ads', storeDir=storeDir)
+    dimension = column
+    if column in RANGE_COLUMNS:
+        cube = loadCube('ranges', storeDir=storeDir)
+        cube = cube[cube['column'] == column]
+        dimension = 'range'
+    for party in PARTIES:
+        ads = loadAds(party, [column], storeDir)
+        expected = ads.dropna(subset=[column]).astype({column: 'object'}).groupby(column).size()
+        partyCube = cube[cube['party'] == party].dropna(subset=[dimension])
+        counts = rollUp(partyCube.astype({dimension: 'object'}), dimension, ['ads']).set_index(dimension)['ads']
+        pd.testing.assert_series_equal(counts.astype('int64').sort_index(), expected.sort_index(), check_names=False)
+
+
+def testCubesAreAggregated(storeDir):
+    adsCube = loadCube('ads', storeDir=storeDir)
+    rangesCube = loadCube('ranges', storeDir=storeDir)
+    for party in PARTIES:
+        ads = loadAds(party, RANGE_COLUMNS + ['demographic_distribution'], storeDir)
+        assert adsCube[adsCube['party'] == party]['ads'].sum() == len(ads)
+        partyRanges = rangesCube[rangesCube['party'] == party]
+        assert partyRanges['ads'].sum() == ads[RANGE_COLUMNS].notna().to_numpy().sum()
+        # A row per range string and combination of the two distribution flags at most
+        assert len(partyRanges) <= sum(ads[column].nunique() * 4 for column in RANGE_COLUMNS)
+        hasDemographic = partyRanges[partyRanges[hasColumn('demographic_distribution')]]
+        assert hasDemographic['ads'].sum() == (ads['demographic_distribution'].notna().to_numpy()[:, None] &
+                                               ads[RANGE_COLUMNS].notna().to_numpy()).sum()
+
+
+@pytest.mark.parametrize('metric', RANGE_COLUMNS)
+def testAdsCubeSumsMetricsLikeGroupBy(storeDir, metric):
+    cube = loadCube('ads', storeDir=storeDir)
+    for party in PARTIES:
+        ads = loadAds(party, ['ad_delivery_start_time', midColumn(metric)], storeDir)
+        ads['Date'] = ads['ad_delivery_start_time'].dt.month
+        expected = ads.groupby('Date').agg(sum=(midColumn(metric), 'sum'), count=(midColumn(metric), 'count'))
+        partyCube = cube[cube['party'] == party]
+        partyCube = partyCube.assign(Date=partyCube['day'].dt.month)
+        sums = rollUp(partyCube, 'Date', [metric, adsColumn(metric)]).set_index('Date')
+        np.testing.assert_allclose(sums[metric].to_numpy(), expected['sum'].to_numpy())
+        np.testing.assert_array_equal(sums[adsColumn(metric)].to_numpy(), expected['count'].to_numpy())
+
+
+@pytest.mark.parametrize('column', ['languages'] + RANGE_COLUMNS)
+def testBarchartCountsRanges(storeDir, column):
+    fig = barchartFigures(loadCube('ads', storeDir=storeDir), loadCube('ranges', storeDir=storeDir), column,
+                          amountNonOtherBars=1000)[0]
+    for trace in fig.data:
+        for party, count in zip(trace.x, trace.y):
+            if trace.name == 'Other':
+                continue
+            ads = loadAds(party.lower(), [column], storeDir)
+            assert count == (ads[column] == trace.name).sum()
+    # Only the ads with a value are counted, and in the title
+    assert 'nan' not in [trace.name for trace in fig.data]
+    ads = loadAds('democrats', [column], storeDir)
+    assert 'Democrats: ' + str(round(ads[column].notna().mean() * 100)) + '%' in fig.layout.title.text
+
+
+@pytest.mark.parametrize('name', ['demographic', 'region'])
+def testDistributionCubeWeighsLikeGroupBy(storeDir, name):
+    column = {'demographic': 'demographic_distribution', 'region': 'delivery_by_region'}[name]
+    keys = DISTRIBUTION_KEYS[column]
+    cube = loadCube(name, storeDir=storeDir)
+    for party in PARTIES:
+        ads = loadAds(party, [column, midColumn('spend')], storeDir)
+        entries = explodeDistribution(ads[column], keys)
+        entries['spend'] = ads[midColumn('spend')].to_numpy()[entries['row'].to_numpy()] * entries['percentage']
+        expected = entries.groupby(keys, observed=True)[['percentage', 'spend']].sum().reset_index()
+        sums = rollUp(cube[cube['party'] == party], keys, ['ads', 'spend']).rename(columns={'ads': 'percentage'})
+        expected = sortedFrame(expected)
+        sums = sortedFrame(sums[keys + ['percentage', 'spend']])
+        pd.testing.assert_frame_equal(sums[keys], expected[keys])
+        np.testing.assert_allclose(sums[['percentage', 'spend']].to_numpy(),
+                                   expected[['percentage', 'spend']].to_numpy())
+
+
+# The distributions are parsed per page and shared with the cubes, put together they are the parse of all ads
+@pytest.mark.parametrize('column', list(DISTRIBUTION_KEYS))
+def testDistributionOfPagesIsDistributionOfAds(storeDir, column):
+    loadCube('ads', storeDir=storeDir)
+    for party in PARTIES:
+        expected = explodeDistribution(loadAds(party, [column], storeDir)[column], DISTRIBUTION_KEYS[column])
+        pd.testing.assert_frame_equal(loadDistribution(party, column, storeDir), expected)
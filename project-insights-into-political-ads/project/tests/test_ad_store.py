@@ -0,0 +1,102 @@
+import json
+import pandas as pd
+import pytest
+from os import listdir, remove
+from os.path import join
+import ad_store
+from ad_cube import loadCube
+from ad_store import dateSlice, ingestParty, loadAds, loadAdsBetween, manifestFile, monthRange, pageFiles, \
+    partyStoreDir, STORE_VERSION
+from conftest import writePage
+from term_counts import countPartyTerms
+
+
+def assertSameStore(storeDir, otherDir, party):
+    pd.testing.assert_frame_equal(loadAds(party, storeDir=storeDir), loadAds(party, storeDir=otherDir))
+    pd.testing.assert_frame_equal(loadCube('ads', [party], storeDir), loadCube('ads', [party], otherDir))
+    assert countPartyTerms(party, workers=1, storeDir=storeDir) == countPartyTerms(party, workers=1, storeDir=otherDir)
+
+
+def testIncrementalIngestMatchesFullIngest(tmp_path, adsDirs, storeDir):
+    directory = adsDirs['democrats']
+    # Builds the derived data, so the ingest has partials to keep and to replace
+    loadCube('ads', ['democrats'], storeDir)
+    countPartyTerms('democrats', workers=1, storeDir=storeDir)
+
+    writePage(join(directory, 'Page,1.csv'), 2, 120, 100)
+    writePage(join(directory, 'Page,3.csv'), 4, 80, 101)
+    remove(join(directory, 'Page,0.csv'))
+    changed, removed = ingestParty('democrats', storeDir=storeDir, workers=1)
+    assert sorted(changed) == ['Page,1.csv', 'Page,3.csv']
+    assert removed == ['Page,0.csv']
+
+    fullDir = join(str(tmp_path), 'full-store')
+    ingestParty('democrats', storeDir=fullDir, workers=1, full=True)
+    assertSameStore(storeDir, fullDir, 'democrats')
+
+
+def testOlderStoreIsIngestedAgain(tmp_path, adsDirs, storeDir):
+    expected = loadCube('ads', storeDir=storeDir)
+    with open(manifestFile('democrats', storeDir), encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['version'] = STORE_VERSION - 1
+    with open(manifestFile('democrats', storeDir), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    # A store without a manifest, with a page file of a csv that is gone
+    remove(manifestFile('republicans', storeDir))
+    stale = join(partyStoreDir('republicans', storeDir), 'Gone,1.parquet')
+    with open(stale, 'wb') as f:
+        f.write(b'')
+
+    pd.testing.assert_frame_equal(loadCube('ads', storeDir=storeDir), expected)
+    for party in ad_store.PARTY_DIRS:
+        with open(manifestFile(party, storeDir), encoding='utf-8') as f:
+            assert json.load(f)['version'] == STORE_VERSION
+    assert 'Gone,1.parquet' not in listdir(partyStoreDir('republicans', storeDir))
+
+
+# Open sides, months and a year, and ranges before and after the ads of all pages (their days are 1 to 28)
+RANGES = [(None, None), (None, '2020-04-01'), ('2020-10-15', None), monthRange(2020, 3), monthRange(2020, 12),
+          monthRange(2020), ('2019-01-01', '2020-01-01'), ('2020-12-29', None)]
+
+
+# The ads between two dates are the ads of a boolean filter on the start time, with their position in `loadAds` as
+# index. Start times with a time of day are in the range of their day
+@pytest.mark.parametrize('times', [False, True])
+@pytest.mark.parametrize('start, end', RANGES)
+def testLoadAdsBetweenFiltersLikeBooleanMask(storeDir, monkeypatch, times, start, end):
+    columns = ['ad_archive_id', 'currency']
+    readFiles = []
+    loadPage = ad_store.loadPage
+    monkeypatch.setattr(ad_store, 'loadPage', lambda file, columns=None: readFiles.append(file) or
+                        loadPage(file, columns))
+    for party in ad_store.PARTY_DIRS:
+        ads = loadAds(party, columns + ['ad_delivery_start_time'], storeDir).reset_index(drop=True)
+        dates = ads['ad_delivery_start_time']
+        mask = dates.notna()
+        if start is not None:
+            mask &= dates >= pd.Timestamp(start)
+        if end is not None:
+            mask &= dates < pd.Timestamp(end)
+        expected = ads[mask][columns]
+
+        files = pageFiles(party, storeDir)
+        inRange = [file for file in files if loadPage(file, ['ad_delivery_start_time'])['ad_delivery_start_time']
+                   .between(pd.Timestamp(start or '1900'), pd.Timestamp(end or '2100'), 'left').any()]
+
+        readFiles.clear()
+        between = loadAdsBetween(party, start, end, columns, storeDir)
+        pd.testing.assert_frame_equal(between, expected, check_index_type=False)
+        # Only the pages with ads in the range are read, an empty range reads the first page for its columns
+        assert readFiles == (inRange if len(inRange) > 0 else files[:1])
+
+
+def testDateSliceSkipsMissingDates():
+    dates = pd.Series(pd.to_datetime(['2020-01-31 12:00', '2020-02-01 00:00', '2020-02-29 23:59', '2020-03-01 00:00',
+                                      None, None]))
+    assert dateSlice(dates, *monthRange(2020, 2)) == slice(1, 3)
+    assert dateSlice(dates) == slice(0, 4)
+    assert dateSlice(dates, end='2020-01-01') == slice(0, 0)
+    assert dateSlice(dates, '2021-01-01') == slice(4, 4)
+    assert monthRange(2020, 12) == (pd.Timestamp(2020, 12, 1), pd.Timestamp(2021, 1, 1))
+    assert monthRange(2020) == (pd.Timestamp(2020, 1, 1), pd.Timestamp(2021, 1, 1))
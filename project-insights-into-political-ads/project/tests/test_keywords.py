@@ -0,0 +1,44 @@
+import re
+import numpy as np
+import pytest
+from ad_store import loadAds, TEXT_COLUMNS
+from keyword_index import loadKeywordIndex, PUNCTUATION
+from keyword_matcher import matchPartyAds, unpackMatches, KeywordMatcher
+
+KEYWORDS = ['Biden', 'vote', 'Trump', 'n', "Biden's", 'chip in', '']
+PARTIES = ['democrats', 'republicans']
+
+
+# Ads with the keyword in one of the text columns, like the plotters matched them before the matcher
+def containsAny(ads, keyword, ignoreCase=False, regex=False):
+    return np.logical_or.reduce([ads[column].astype(object).str.contains(keyword, case=not ignoreCase, regex=regex,
+                                                                          na=False).to_numpy()
+                                 for column in TEXT_COLUMNS])
+
+
+@pytest.mark.parametrize('ignoreCase', [False, True])
+def testMatcherMatchesLikeStrContains(storeDir, ignoreCase):
+    for party in PARTIES:
+        ads = loadAds(party, TEXT_COLUMNS, storeDir)
+        matches = unpackMatches(matchPartyAds(party, KEYWORDS, 'substring', ignoreCase, storeDir), len(KEYWORDS))
+        for i, keyword in enumerate(KEYWORDS):
+            np.testing.assert_array_equal(matches[:, i], containsAny(ads, keyword, ignoreCase), err_msg=keyword)
+
+
+def testMatcherFindsOverlappingKeywords():
+    matcher = KeywordMatcher(['vote', 'voters', 'tern', 'vot'])
+    assert matcher.matchText('voters') == 0b1011
+    assert matcher.matchText('') == 0
+
+
+def testIndexMatchesWholeWordsLikeStrContains(storeDir):
+    for party in PARTIES:
+        ads = loadAds(party, TEXT_COLUMNS, storeDir)
+        # The index removes punctuation and ignores case, a word then matches where it is not part of a longer word
+        texts = ads[TEXT_COLUMNS].apply(lambda column: column.astype(object).str.replace(PUNCTUATION, '', regex=True))
+        index = loadKeywordIndex(party, storeDir)
+        assert index.rowCount == len(ads)
+        for keyword in ['biden', 'Bidens', 'vote', 'in', 'chip in']:
+            expected = np.logical_and.reduce([containsAny(texts, r'(?<!\w)' + re.escape(word) + r'(?!\w)', True, True)
+                                              for word in keyword.split()])
+            np.testing.assert_array_equal(index.allOf(keyword), np.flatnonzero(expected), err_msg=keyword)
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from ad_store import loadAds, TEXT_COLUMNS
+from keyword_timeseries import KeywordTimeSeries
+from test_keywords import containsAny
+
+KEYWORDS = ['Biden', 'vote', '']
+
+
+# The days of the counts start at the day of the first ad, also when start times have a time of day
+@pytest.mark.parametrize('times', [False, True])
+def testKeywordTimeSeriesCountsLikeGroupBy(storeDir, times):
+    timeSeries = KeywordTimeSeries(KEYWORDS, storeDir=storeDir)
+    for p, party in enumerate(timeSeries.parties):
+        ads = loadAds(party, TEXT_COLUMNS + ['ad_delivery_start_time'], storeDir)
+        assert (ads['ad_delivery_start_time'].dt.hour > 0).any() == times
+        days = ads['ad_delivery_start_time'].dt.normalize()
+        for k, keyword in enumerate(KEYWORDS):
+            expected = days[containsAny(ads, keyword)].value_counts()
+            counts = pd.Series(timeSeries.counts[:, k, p], index=timeSeries.dates)
+            pd.testing.assert_series_equal(counts[counts > 0], expected.sort_index(), check_names=False,
+                                           check_freq=False, check_index_type=False)
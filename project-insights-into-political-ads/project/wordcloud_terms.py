@@ -0,0 +1,159 @@
+import pandas as pd
+from collections import defaultdict
+from os import makedirs
+from os.path import isfile, join
+from wordcloud import WordCloud, STOPWORDS
+from ad_store import iterPage, loadPage, checkStore, derivedDir, mapFiles, pageFiles, pageHashes, partialDir, \
+    partialFile, removeStalePartials, uniqueRows, PARTY_DIRS, STORE_DIR
+from term_counts import COUNT_COLUMNS
+
+# Words as `WordCloud` finds them in a text
+TOKEN_PATTERN = r"\w[\w']*"
+# Amount of ads that are split into words at once
+CHUNK_SIZE = 50000
+WORDCLOUD_OPTIONS = {
+    'width': 1500,
+    'height': 1000,
+    'random_state': 42,
+    'collocations': False,
+    'background_color': 'lightgreen',
+    'colormap': 'tab10',
+}
+
+
+# Counts the words of the ads that have all COUNT_COLUMNS, per year and month of ad_delivery_start_time (0 when
+# missing). Words are found like `WordCloud.generate` does: with their case, without "'s" and without numbers. Every
+# distinct text of a column in a month is split into words once
+def countMonthTerms(df):
+    df = df.dropna(subset=COUNT_COLUMNS)
+    counts = []
+    for start in range(0, len(df), CHUNK_SIZE):
+        dates = df['ad_delivery_start_time'].iloc[start:start + CHUNK_SIZE]
+        chunk = df[COUNT_COLUMNS].iloc[start:start + CHUNK_SIZE].assign(
+            year=dates.dt.year.fillna(0).astype('int16'), month=dates.dt.month.fillna(0).astype('int8'))
+        for column in COUNT_COLUMNS:
+            texts, _, textCounts = uniqueRows(chunk, ['year', 'month', column])
+            terms = pd.DataFrame({
+                'year': texts['year'].to_numpy(),
+                'month': texts['month'].to_numpy(),
+                'term': texts[column].astype(str).str.findall(TOKEN_PATTERN).to_numpy(),
+                'count': textCounts,
+            }).explode('term').dropna(subset=['term'])
+            term = terms['term'].astype(str)
+            term = term.where(~term.str.lower().str.endswith("'s"), term.str[:-2])
+            terms = terms.assign(term=term)[~term.str.isdigit()]
+            counts.append(terms.groupby(['year', 'month', 'term'])['count'].sum())
+    if len(counts) == 0:
+        return pd.DataFrame({'year': pd.Series(dtype='int16'), 'month': pd.Series(dtype='int8'),
+                             'term': pd.Series(dtype='object'), 'count': pd.Series(dtype='int64')})
+    counts = pd.concat(counts)
+    return counts.groupby(level=[0, 1, 2]).sum().reset_index()
+
+
+# Counts the words of a page file per year and month, reading one chunk of ads at a time
+def countPageMonthTerms(file, partial):
+    columns = COUNT_COLUMNS + ['ad_delivery_start_time']
+    counts = [countMonthTerms(df) for df in iterPage(file, columns)]
+    if len(counts) == 0:
+        counts = [countMonthTerms(loadPage(file, columns))]
+    df = pd.concat(counts).groupby(['year', 'month', 'term'], as_index=False)['count'].sum()
+    df.to_parquet(partial, index=False)
+
+
+def monthTermsFile(party, storeDir=STORE_DIR):
+    return join(derivedDir(party, storeDir), 'wordcloud-terms.parquet')
+
+
+# Returns the word counts of a party per year and month. The counts of every page are kept in the store and only new
+# or changed pages are counted again. The scripts have no `__main__` guard, so by default the pages are counted in
+# this process
+def loadMonthTerms(party, storeDir=STORE_DIR, workers=1):
+    checkStore(party, storeDir)
+    file = monthTermsFile(party, storeDir)
+    if isfile(file):
+        return pd.read_parquet(file)
+
+    files = pageFiles(party, storeDir)
+    hashes = pageHashes(party, storeDir)
+    makedirs(partialDir(party, 'wordcloud-terms', storeDir), exist_ok=True)
+    missing = {pageHash: page for page, pageHash in zip(files, hashes)
+               if not isfile(partialFile(party, 'wordcloud-terms', pageHash, storeDir))}
+    mapFiles(countPageMonthTerms, list(missing.values()),
+             [partialFile(party, 'wordcloud-terms', pageHash, storeDir) for pageHash in missing], workers=workers)
+
+    df = pd.concat([pd.read_parquet(partialFile(party, 'wordcloud-terms', pageHash, storeDir)) for pageHash in hashes])
+    df = df.groupby(['year', 'month', 'term'], as_index=False)['count'].sum()
+    makedirs(derivedDir(party, storeDir), exist_ok=True)
+    df.to_parquet(file, index=False)
+    removeStalePartials(party, 'wordcloud-terms', hashes, storeDir)
+    return df
+
+
+# Merges the counts of the cases of a word into its most common case and plurals into their singular, like
+# `wordcloud.tokenization.process_tokens` does for a list of words
+def mergeWordForms(counts, normalizePlurals=True):
+    forms = defaultdict(dict)
+    for word, count in counts.items():
+        forms[word.lower()][word] = count
+    if normalizePlurals:
+        for key in list(forms):
+            if key.endswith('s') and not key.endswith('ss') and key[:-1] in forms:
+                singular = forms[key[:-1]]
+                for word, count in forms.pop(key).items():
+                    singular[word[:-1]] = singular.get(word[:-1], 0) + count
+    return {max(cases.items(), key=lambda item: item[1])[0]: sum(cases.values()) for cases in forms.values()}
+
+
+# Returns the word frequencies of rows of month counts, without stopwords, as `WordCloud.generate` would count them
+def wordFrequencies(monthTerms, stopwords=STOPWORDS):
+    stopwords = set([word.lower() for word in stopwords])
+    counts = monthTerms.groupby('term')['count'].sum()
+    counts = counts[~counts.index.str.lower().isin(stopwords)]
+    return mergeWordForms(counts.to_dict())
+
+
+# Returns the word frequencies of the ads of a party in a year and/or month (None for all)
+def termFrequencies(party, year=None, month=None, stopwords=STOPWORDS, storeDir=STORE_DIR):
+    df = loadMonthTerms(party, storeDir)
+    if year is not None:
+        df = df[df['year'] == int(year)]
+    if month is not None:
+        df = df[df['month'] == int(month)]
+    return wordFrequencies(df, stopwords)
+
+
+def wordcloudName(party, year=None, month=None):
+    fileName = party
+    if year is not None:
+        fileName += '-year-' + str(year)
+    if month is not None:
+        fileName += '-month-' + str(month)
+    return 'wordcloud-' + fileName + '.png'
+
+
+def makeWordCloud(frequencies):
+    return WordCloud(**WORDCLOUD_OPTIONS).generate_from_frequencies(frequencies)
+
+
+# Renders a word cloud png for every party and every year and month with ads into outDir. Returns the written files
+def renderAllMonths(outDir='.', stopwords=STOPWORDS, parties=None, storeDir=STORE_DIR):
+    if parties is None:
+        parties = list(PARTY_DIRS)
+    makedirs(outDir, exist_ok=True)
+    files = []
+    for party in parties:
+        df = loadMonthTerms(party, storeDir)
+        for (year, month), monthTerms in df[df['year'] > 0].groupby(['year', 'month']):
+            monthFrequencies = wordFrequencies(monthTerms, stopwords)
+            if len(monthFrequencies) == 0:
+                continue
+            file = join(outDir, wordcloudName(party, year, month))
+            makeWordCloud(monthFrequencies).to_file(file)
+            files.append(file)
+    return files
+
+
+if __name__ == "__main__":
+    for party in PARTY_DIRS:
+        print('Counting the words of ' + party + ' per month')
+        loadMonthTerms(party, workers=None)
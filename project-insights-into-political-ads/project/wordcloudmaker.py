@@ -1,31 +1,21 @@
 import pandas as pd
 import matplotlib.pyplot as plt
-from wordcloud import WordCloud, STOPWORDS
-from os import listdir
-from os.path import isfile, join
-
-
-# Returns dataframe without columns that we dont use
-def loadCsv(csv):
-    df = pd.read_csv(csv)
-    df = df.drop(
-        columns=['page_id', 'page_name', 'ad_creation_time', 'ad_delivery_stop_time', 'byline', 'impressions', 'spend',
-                 'currency', 'demographic_distribution', 'delivery_by_region', 'publisher_platforms',
-                 'estimated_audience_size', 'languages'])
-    return df
+from wordcloud import STOPWORDS
+from ad_store import PARTY_DIRS
+from wordcloud_terms import makeWordCloud, renderAllMonths, termFrequencies, wordcloudName
 
 
 def draw_wordcloud(wordcloud, size, fileName):
     plt.figure(figsize=size)
     plt.imshow(wordcloud)
     plt.axis("off")
-    wordcloud.to_file('wordcloud-' + fileName + '.png')
+    wordcloud.to_file(fileName)
+    plt.close()
 
 
 year = '2020'  # change the year to get the words from just that year
 month = '10'  # change the month to get the words from just that month
-democratDir = './ads/democrats'
-republicanDir = './ads/republicans'
+allMonths = False  # set to True to make a wordcloud of every month of every party instead
 
 extraStopWords = [
     'a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w',
@@ -34,39 +24,13 @@ extraStopWords = [
 for word in extraStopWords:
     STOPWORDS.add(word)
 
-for party, directory in {'democrats': democratDir, 'republicans': republicanDir}.items():
-    dfs = []
-    onlyfiles = [f for f in listdir(directory) if isfile(join(directory, f))]
-    for file in onlyfiles:
-        dfs.append(loadCsv(directory + '/' + file))
-
-    df = pd.concat(dfs)
-    columnsToCheck = ['ad_creative_bodies', 'ad_creative_link_titles', 'ad_creative_link_descriptions']
-    df = df.dropna(subset=columnsToCheck)
-
-    if year != '':
-        query = "ad_delivery_start_time.str.contains('" + year + "', na=False)"
-        df = df.query(query, engine='python')
-
-    if month != '':
-        query = "ad_delivery_start_time.str.contains('-" + month + "-', na=False)"
-        df = df.query(query, engine='python')
-
-    words = ''
-    for column in columnsToCheck:
-        # iterate through the csv file 
-        words += ' '.join(df[column].astype(str))
-
-    wordcloud = WordCloud(width=1500,
-                          height=1000,
-                          random_state=42,
-                          collocations=False,
-                          background_color='lightgreen',
-                          colormap='tab10',
-                          stopwords=STOPWORDS).generate(words)
-    fileName = party
-    if year != '':
-        fileName += '-year-' + year
-    if month != '':
-        fileName += '-month-' + month
-    draw_wordcloud(wordcloud, (12, 8), fileName)
+if allMonths:
+    for file in renderAllMonths('.', STOPWORDS):
+        print(file)
+else:
+    for party in PARTY_DIRS:
+        # The words are counted per month once, the wordcloud is made from those counts
+        frequencies = termFrequencies(party, year if year != '' else None, month if month != '' else None, STOPWORDS)
+        wordcloud = makeWordCloud(frequencies)
+        draw_wordcloud(wordcloud, (12, 8), wordcloudName(party, year if year != '' else None,
+                                                         month if month != '' else None))
@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+
+REPORT_FILE = 'FacebookAdLibraryReport_180222_US.csv'
+# Columns of the Ad Library report
+PAGE_ID = 'Page ID'
+PAGE_NAME = 'Page name'
+DISCLAIMER = 'Disclaimer'
+AMOUNT_SPENT = 'Amount spent (USD)'
+NUMBER_OF_ADS = 'Number of ads in Library'
+# Disclaimer of the ads without one, it does not link pages
+NO_DISCLAIMER = 'These ads ran without a disclaimer'
+
+
+def read_report(file=REPORT_FILE):
+    return pd.read_csv(file)
+
+
+# Amounts of the report as numbers: the report gives small amounts as an upper bound like '≤100', those count as the
+# bound. Missing amounts count as 0
+def parse_amounts(amounts):
+    if pd.api.types.is_numeric_dtype(amounts):
+        return amounts.fillna(0).to_numpy(dtype=np.float64)
+    amounts = amounts.astype(str).str.replace(r'[^\d.]', '', regex=True)
+    return pd.to_numeric(amounts, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+
+# Compressed sparse rows of the edges (rows[i], columns[i]): the columns of row r are indices[indptr[r]:indptr[r + 1]],
+# sorted
+def to_csr(rows, columns, row_count):
+    order = np.lexsort((columns, rows))
+    indptr = np.zeros(row_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=row_count), out=indptr[1:])
+    return indptr, columns[order]
+
+
+# Returns the columns of the given rows of a CSR matrix, in one gather over the concatenated slices
+def gather(indptr, indices, rows):
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(lengths.sum())]
+
+
+# Returns the connected component of every node of an undirected graph with node_count nodes and edges (u[i], v[i]),
+# numbered from 0 in the order of their smallest node. Union-find over all edges at once: every round hooks the root
+# of the larger of the two roots of every edge onto the smaller one, then compresses the paths until every node
+# points at its root
+def connected_components(u, v, node_count):
+    parent = np.arange(node_count)
+    while True:
+        ru = parent[u]
+        rv = parent[v]
+        differ = ru != rv
+        if not differ.any():
+            break
+        np.minimum.at(parent, np.maximum(ru, rv)[differ], np.minimum(ru, rv)[differ])
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+    return np.unique(parent, return_inverse=True)[1]
+
+
+class DisclaimerGraph:
+    """
+    Bipartite graph of the pages and disclaimers of an Ad Library report, with an edge between a page and every
+    disclaimer that its ads ran with. Pages and disclaimers are integer codes (positions in page_ids and disclaimers),
+    the edges are kept as CSR arrays in both directions, so the neighbours of any set of nodes are found by slicing
+    instead of by scanning the report. Every edge holds the amount spent and the amount of ads of the page with the
+    disclaimer, the edges are sorted by page and then by disclaimer.
+    """
+    def __init__(self, page_ids, page_names, page_spend, disclaimers, edge_pages, edge_disclaimers, edge_spend,
+                 edge_ads):
+        self.page_ids = np.asarray(page_ids)
+        self.page_names = np.asarray(page_names, dtype=object)
+        self.page_spend = np.asarray(page_spend)
+        self.disclaimers = np.asarray(disclaimers, dtype=object)
+        self.edge_pages = np.asarray(edge_pages, dtype=np.int64)
+        self.edge_disclaimers = np.asarray(edge_disclaimers, dtype=np.int64)
+        self.edge_spend = np.asarray(edge_spend)
+        self.edge_ads = np.asarray(edge_ads)
+        self.page_indptr, self.page_disclaimers = to_csr(self.edge_pages, self.edge_disclaimers, len(self.page_ids))
+        self.disclaimer_indptr, self.disclaimer_pages = to_csr(self.edge_disclaimers, self.edge_pages,
+                                                               len(self.disclaimers))
+        # Component of every page and disclaimer, see `components`
+        self.page_components = None
+        self.disclaimer_components = None
+
+    @classmethod
+    def from_report(cls, df):
+        """
+        Builds the graph from the rows of a report in one pass: every page once (with the name of its first row) and
+        every distinct (page, disclaimer) pair as one edge. The amount spent and the amount of ads of the rows are
+        summed per pair in one grouping, the amount spent of a page is the sum over its pairs, including the rows
+        without a disclaimer.
+        """
+        pages, page_ids = pd.factorize(df[PAGE_ID])
+        page_names = df[PAGE_NAME].groupby(pages).first().to_numpy()
+
+        linked = (df[DISCLAIMER].notna() & (df[DISCLAIMER] != NO_DISCLAIMER)).to_numpy()
+        disclaimer_codes, disclaimers = pd.factorize(df[DISCLAIMER].where(linked))
+        # Disclaimer code 0 stands for the rows without a disclaimer
+        slots = len(disclaimers) + 1
+        keys, rows = np.unique(pages.astype(np.int64) * slots + disclaimer_codes + 1, return_inverse=True)
+        pair_spend = np.bincount(rows, parse_amounts(df[AMOUNT_SPENT]), minlength=len(keys))
+        pair_ads = np.bincount(rows, parse_amounts(df[NUMBER_OF_ADS]), minlength=len(keys))
+        pair_pages = keys // slots
+        page_spend = np.bincount(pair_pages, pair_spend, minlength=len(page_ids))
+
+        edges = keys % slots > 0
+        return cls(page_ids, page_names, page_spend, disclaimers, pair_pages[edges], keys[edges] % slots - 1,
+                   pair_spend[edges], pair_ads[edges])
+
+    def page_codes(self, page_ids):
+        """
+        Returns the codes of page ids, raises ValueError for ids that are not in the report.
+        """
+        page_ids = np.atleast_1d(np.asarray(page_ids))
+        codes = pd.Index(self.page_ids).get_indexer(page_ids)
+        if (codes < 0).any():
+            raise ValueError('Pages not in the report: ' + ', '.join(str(page_id) for page_id in page_ids[codes < 0]))
+        return codes
+
+    def disclaimers_of(self, pages):
+        return np.unique(gather(self.page_indptr, self.page_disclaimers, np.asarray(pages, dtype=np.int64)))
+
+    def pages_of(self, disclaimers):
+        return np.unique(gather(self.disclaimer_indptr, self.disclaimer_pages, np.asarray(disclaimers, dtype=np.int64)))
+
+    def neighbourhood(self, page_ids, hops=1):
+        """
+        Returns the codes of the pages, the disclaimers and the edges (page and disclaimer arrays) within hops of seed
+        pages. One hop adds the disclaimers of the pages found so far and every page that ran ads with one of them,
+        hops=None expands until the whole components of the seeds are found. All seeds are expanded at once, breadth
+        first, and every disclaimer is expanded only once.
+        """
+        seeds = self.page_codes(page_ids)
+        pages = np.zeros(len(self.page_ids), dtype=bool)
+        disclaimers = np.zeros(len(self.disclaimers), dtype=bool)
+        pages[seeds] = True
+        frontier = np.unique(seeds)
+        hop = 0
+        while len(frontier) > 0 and (hops is None or hop < hops):
+            found = self.disclaimers_of(frontier)
+            found = found[~disclaimers[found]]
+            disclaimers[found] = True
+            frontier = self.pages_of(found)
+            frontier = frontier[~pages[frontier]]
+            pages[frontier] = True
+            hop += 1
+        # Seeds without disclaimers are kept as nodes without edges
+        return self.part(np.flatnonzero(pages), np.flatnonzero(disclaimers))
+
+    def part(self, pages, disclaimers):
+        """
+        Returns the pages, the disclaimers and the edges of the disclaimers (the pages of which must all be in pages).
+        """
+        edge_pages = gather(self.disclaimer_indptr, self.disclaimer_pages, disclaimers)
+        edge_disclaimers = np.repeat(disclaimers, np.diff(self.disclaimer_indptr)[disclaimers])
+        return pages, disclaimers, edge_pages, edge_disclaimers
+
+    def components(self):
+        """
+        Returns the component of every page and of every disclaimer: pages are in one component when a chain of shared
+        disclaimers links them. Computed once for the whole report.
+        """
+        if self.page_components is None:
+            labels = connected_components(self.edge_pages, len(self.page_ids) + self.edge_disclaimers,
+                                          len(self.page_ids) + len(self.disclaimers))
+            self.page_components = labels[:len(self.page_ids)]
+            self.disclaimer_components = labels[len(self.page_ids):]
+        return self.page_components, self.disclaimer_components
+
+    def component_table(self):
+        """
+        Returns dataframe with a row per component: the amount of pages and disclaimers, the summed amount spent of its
+        pages and the name of the page that spent most, sorted by amount spent (largest first).
+        """
+        page_components, disclaimer_components = self.components()
+        count = page_components.max() + 1 if len(page_components) > 0 else 0
+        spend = np.bincount(page_components, self.page_spend, minlength=count)
+        # The pages sorted by component and then by amount spent, so the last page of every component spent most
+        order = np.lexsort((self.page_spend, page_components))
+        last = np.searchsorted(page_components[order], np.arange(count), 'right') - 1
+        df = pd.DataFrame({
+            'Component': np.arange(count),
+            'Pages': np.bincount(page_components, minlength=count),
+            'Disclaimers': np.bincount(disclaimer_components, minlength=count),
+            'Amount Spent': spend.round().astype(np.int64),
+            'Largest page': self.page_names[order[last]],
+        })
+        return df.sort_values(['Amount Spent', 'Component'], ascending=[False, True]).reset_index(drop=True)
+
+    def component_part(self, components):
+        """
+        Returns the pages, the disclaimers and the edges of components, see `neighbourhood`.
+        """
+        page_components, disclaimer_components = self.components()
+        return self.part(np.flatnonzero(np.isin(page_components, components)),
+                         np.flatnonzero(np.isin(disclaimer_components, components)))
+
+    def edge_codes(self, edge_pages, edge_disclaimers):
+        """
+        Returns the positions of edges in the edge arrays of the graph.
+        """
+        keys = self.edge_pages * len(self.disclaimers) + self.edge_disclaimers
+        return np.searchsorted(keys, np.asarray(edge_pages) * len(self.disclaimers) + edge_disclaimers)
+
+    def gephi_frames(self, pages, disclaimers, edge_pages, edge_disclaimers, weight='spend'):
+        """
+        Returns the edges (Source, Target, Type, Weight, Amount Spent, Ads) and nodes (Id, Label, isDisclaimer, Amount
+        Spent) dataframes of a part of the graph for Gephi. The pages get ids 0 to len(pages) - 1, the disclaimers the
+        ids after them. The weight of an edge is the amount spent of the page with the disclaimer, or with
+        weight='ads' its amount of ads.
+        """
+        edges = self.edge_codes(edge_pages, edge_disclaimers)
+        spent = self.edge_spend[edges].round().astype(np.int64)
+        ads = self.edge_ads[edges].round().astype(np.int64)
+        spend = np.concatenate([self.page_spend[pages], np.zeros(len(disclaimers))])
+        nodes = pd.DataFrame({
+            'Id': np.arange(len(pages) + len(disclaimers)),
+            'Label': np.concatenate([self.page_names[pages], self.disclaimers[disclaimers]]),
+            'isDisclaimer': np.concatenate([np.zeros(len(pages), dtype=int), np.ones(len(disclaimers), dtype=int)]),
+            'Amount Spent': spend.round().astype(np.int64),
+        })
+        edges = pd.DataFrame({
+            'Source': np.searchsorted(pages, edge_pages),
+            'Target': len(pages) + np.searchsorted(disclaimers, edge_disclaimers),
+            'Type': 'Undirected',
+            'Weight': spent if weight == 'spend' else ads,
+            'Amount Spent': spent,
+            'Ads': ads,
+        })
+        return edges, nodes
+
+    def write_gephi(self, page_ids, edges_file='edges.csv', nodes_file='nodes.csv', hops=1, weight='spend'):
+        """
+        Writes the Gephi edges and nodes csv files of the neighbourhood of seed pages.
+        """
+        edges, nodes = self.gephi_frames(*self.neighbourhood(page_ids, hops), weight=weight)
+        edges.to_csv(edges_file, index=False)
+        nodes.to_csv(nodes_file, index=False)
+        return edges, nodes
+
+    def write_components(self, components, edges_file='edges.csv', nodes_file='nodes.csv', weight='spend'):
+        """
+        Writes the Gephi edges and nodes csv files of components, with the component of every node in the nodes.
+        """
+        pages, disclaimers, edge_pages, edge_disclaimers = self.component_part(components)
+        edges, nodes = self.gephi_frames(pages, disclaimers, edge_pages, edge_disclaimers, weight)
+        page_components, disclaimer_components = self.components()
+        nodes['Component'] = np.concatenate([page_components[pages], disclaimer_components[disclaimers]])
+        edges.to_csv(edges_file, index=False)
+        nodes.to_csv(nodes_file, index=False)
+        return edges, nodes